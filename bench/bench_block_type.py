@@ -0,0 +1,65 @@
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from blocknode import BlockType
+from corpus import CorpusGenerator
+from helper import block_to_block_type
+
+
+def legacy_block_to_block_type(block):
+    # block_to_block_type as it was before the classifier was precompiled
+    if re.match(r"^#{1,6}\s+.+", block):
+        return BlockType.HEADING
+
+    if block.startswith("```") and block.endswith("```"):
+        return BlockType.CODE
+
+    lines = block.split('\n')
+    if all(line.startswith('>') for line in lines):
+        return BlockType.QUOTE
+
+    if all(line.startswith('- ') for line in lines):
+        return BlockType.UNORDERED_LIST
+
+    if len(lines) > 0 and all(re.match(r'^\d+\.\s+', line) for line in lines):
+        return BlockType.ORDERED_LIST
+
+    return BlockType.PARAGRAPH
+
+
+def measure(classify, blocks, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for block in blocks:
+            classify(block)
+        best = min(best, time.perf_counter() - start)
+    return best / len(blocks) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-block cost of block_to_block_type")
+    parser.add_argument("--blocks", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    blocks = CorpusGenerator(seed=args.seed).blocks(args.blocks)
+    for block in blocks:
+        assert block_to_block_type(block) == legacy_block_to_block_type(block), block
+
+    before = measure(legacy_block_to_block_type, blocks, args.repeat)
+    after = measure(block_to_block_type, blocks, args.repeat)
+    print(f"blocks: {len(blocks)}")
+    print(f"before: {before:8.1f} ns/block")
+    print(f"after:  {after:8.1f} ns/block")
+    print(f"speedup: {before / after:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import helper
+from corpus import CorpusGenerator
+
+
+# The node classes as they were before they were slotted
+class LegacyTextNode:
+    def __init__(self, text, text_type, url = None):
+        self.text = text
+        self.text_type = text_type
+        self.url = url
+
+
+class LegacyHTMLNode:
+    def __init__(self, tag = None, value = None, children = None, props = None):
+        self.tag = tag
+        self.value = value
+        self.children = children
+        self.props = props
+
+
+class LegacyLeafNode(LegacyHTMLNode):
+    def __init__(self, tag, value, props = None):
+        super().__init__(tag=tag, value=value, children=None, props=props)
+
+
+class LegacyParentNode(LegacyHTMLNode):
+    def __init__(self, tag, children, props = None):
+        super().__init__(tag=tag, value=None, children=children, props=props)
+
+
+def measure(markdown):
+    # Interned leaves from an earlier run would otherwise be reused, and not counted
+    helper.SHARED_LEAVES.clear()
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    text_nodes = helper.text_to_textnodes(markdown)
+    node = helper.markdown_to_html_node(markdown)
+    elapsed = time.perf_counter() - start
+    snapshot = tracemalloc.take_snapshot()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    allocations = sum(stat.count for stat in snapshot.statistics("filename"))
+    del text_nodes, node
+    return {"retained_mb": current / 1e6, "peak_mb": peak / 1e6, "live_blocks": allocations, "seconds": elapsed}
+
+
+def with_legacy_nodes(fn):
+    saved = helper.TextNode, helper.LeafNode, helper.SharedLeafNode, helper.ParentNode
+    helper.TextNode, helper.LeafNode, helper.SharedLeafNode, helper.ParentNode = LegacyTextNode, LegacyLeafNode, LegacyLeafNode, LegacyParentNode
+    try:
+        return fn()
+    finally:
+        helper.TextNode, helper.LeafNode, helper.SharedLeafNode, helper.ParentNode = saved
+        helper.SHARED_LEAVES.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory held by the node trees of one large page")
+    parser.add_argument("--blocks", type=int, default=20_000)
+    parser.add_argument("--inline", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    markdown = CorpusGenerator(seed=args.seed, inline=args.inline).page(args.blocks)
+    print(f"page: {len(markdown.encode('utf-8')) / 1e6:.2f} MB, {args.blocks} blocks")
+
+    before = with_legacy_nodes(lambda: measure(markdown))
+    after = measure(markdown)
+    for name in ("retained_mb", "peak_mb", "live_blocks", "seconds"):
+        print(f"{name:12} before {before[name]:>12.3f}  after {after[name]:>12.3f}  ratio {after[name] / before[name]:.2f}")
+
+
+if __name__ == "__main__":
+    main()
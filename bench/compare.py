@@ -0,0 +1,31 @@
+import argparse
+import json
+
+
+def load(path):
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two bench/run.py JSON reports")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    args = parser.parse_args()
+
+    before = load(args.before)
+    after = load(args.after)
+    print(f"{'stage':24} {before.get('revision') or 'before':>12} {after.get('revision') or 'after':>12} {'change':>8}")
+
+    for name, result in after["stages"].items():
+        if name not in before["stages"]:
+            continue
+        old = before["stages"][name]["pages_per_sec"]
+        new = result["pages_per_sec"]
+        print(f"{name:24} {old:>12} {new:>12} {new / old:>7.2f}x")
+
+    print(f"{'peak_rss_mb':24} {before['peak_rss_mb']:>12} {after['peak_rss_mb']:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import argparse
+import os
+import random
+import shutil
+
+DEFAULT_MIX = {
+    "paragraph": 6,
+    "heading": 2,
+    "code": 1,
+    "quote": 1,
+    "unordered_list": 1,
+    "ordered_list": 1,
+}
+
+WORDS = [
+    "middle", "earth", "ring", "hobbit", "shire", "elven", "mountain", "river",
+    "wizard", "journey", "ancient", "forest", "shadow", "light", "king", "road",
+]
+
+TEMPLATE = """<!doctype html>
+<html>
+    <head>
+        <title>{{ Title }}</title>
+        <link href="/index.css" rel="stylesheet" />
+    </head>
+    <body>
+        <article>{{ Content }}</article>
+    </body>
+</html>
+"""
+
+
+def parse_mix(text):
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"Unknown block type in mix: {name}")
+        mix[name] = float(weight)
+    return mix
+
+
+class CorpusGenerator:
+    def __init__(self, seed=0, mix=None, inline=0.15, words_per_line=12):
+        self.rng = random.Random(seed)
+        self.mix = mix or DEFAULT_MIX
+        self.inline = inline
+        self.words_per_line = words_per_line
+
+    def word(self):
+        word = self.rng.choice(WORDS)
+        if self.rng.random() >= self.inline:
+            return word
+
+        match self.rng.randrange(5):
+            case 0:
+                return f"**{word}**"
+            case 1:
+                return f"_{word}_"
+            case 2:
+                return f"`{word}`"
+            case 3:
+                return f"[{word}](/blog/{word})"
+            case _:
+                return f"![{word}](/images/{word}.png)"
+
+    def sentence(self):
+        return " ".join(self.word() for _ in range(self.rng.randint(self.words_per_line // 2, self.words_per_line)))
+
+    def lines(self, prefix, count):
+        return "\n".join(f"{prefix(i)}{self.sentence()}" for i in range(count))
+
+    def block(self, block_type=None):
+        if block_type is None:
+            names = list(self.mix)
+            block_type = self.rng.choices(names, weights=[self.mix[name] for name in names])[0]
+
+        match block_type:
+            case "paragraph":
+                return self.lines(lambda i: "", self.rng.randint(1, 5))
+            case "heading":
+                return f"{'#' * self.rng.randint(2, 6)} {self.sentence()}"
+            case "code":
+                code = "\n".join(f"    {' '.join(self.rng.choices(WORDS, k=6))}" for _ in range(self.rng.randint(1, 10)))
+                return f"```\n{code}\n```"
+            case "quote":
+                return self.lines(lambda i: "> ", self.rng.randint(1, 4))
+            case "unordered_list":
+                return self.lines(lambda i: "- ", self.rng.randint(1, 8))
+            case "ordered_list":
+                return self.lines(lambda i: f"{i + 1}. ", self.rng.randint(1, 8))
+
+    def blocks(self, count):
+        return [self.block() for _ in range(count)]
+
+    def page(self, blocks_per_page):
+        title = " ".join(self.rng.choices(WORDS, k=4)).title()
+        return "\n\n".join([f"# {title}", *self.blocks(blocks_per_page)]) + "\n"
+
+
+def write_corpus(root, pages, blocks_per_page, generator=None, pages_per_dir=100):
+    generator = generator or CorpusGenerator()
+    content_dir = os.path.join(root, "content")
+    if os.path.exists(content_dir):
+        shutil.rmtree(content_dir)
+
+    total_bytes = 0
+    for i in range(pages):
+        page_dir = content_dir if i == 0 else os.path.join(content_dir, f"section{i // pages_per_dir}", f"page{i}")
+        os.makedirs(page_dir, exist_ok=True)
+        data = generator.page(blocks_per_page).encode("utf-8")
+        total_bytes += len(data)
+        with open(os.path.join(page_dir, "index.md"), "wb") as file:
+            file.write(data)
+
+    os.makedirs(os.path.join(root, "static"), exist_ok=True)
+    with open(os.path.join(root, "static", "index.css"), "w", encoding="utf-8") as file:
+        file.write("body { margin: 0; }\n")
+    with open(os.path.join(root, "template.html"), "w", encoding="utf-8") as file:
+        file.write(TEMPLATE)
+    os.makedirs(os.path.join(root, "docs"), exist_ok=True)
+
+    return total_bytes
+
+
+def add_corpus_args(parser):
+    parser.add_argument("--pages", type=int, default=200, help="number of pages to generate")
+    parser.add_argument("--blocks-per-page", type=int, default=50, help="blocks per page, excluding the title")
+    parser.add_argument("--mix", type=parse_mix, default=None, help="block weights, e.g. paragraph=6,code=1")
+    parser.add_argument("--inline", type=float, default=0.15, help="fraction of words carrying inline markup")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic markdown site")
+    parser.add_argument("root", help="directory to write content/, static/ and template.html into")
+    add_corpus_args(parser)
+    args = parser.parse_args()
+
+    generator = CorpusGenerator(seed=args.seed, mix=args.mix, inline=args.inline)
+    total_bytes = write_corpus(args.root, args.pages, args.blocks_per_page, generator)
+    print(f"Wrote {args.pages} pages ({total_bytes / 1e6:.2f} MB) to {args.root}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+import main as site_main
+from corpus import CorpusGenerator, add_corpus_args, write_corpus
+from helper import block_to_block_type, markdown_to_blocks, markdown_to_html_node, text_to_textnodes
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes everywhere else
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BENCH_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def stage_result(seconds, pages, nbytes):
+    return {
+        "seconds": round(seconds, 6),
+        "pages_per_sec": round(pages / seconds, 2) if seconds else None,
+        "mb_per_sec": round(nbytes / 1e6 / seconds, 2) if seconds else None,
+    }
+
+
+def bench_stages(documents, repeat):
+    nbytes = sum(len(document.encode("utf-8")) for document in documents)
+    pages = len(documents)
+    blocks = [block for document in documents for block in markdown_to_blocks(document)]
+    inline_texts = [" ".join(block.split("\n")) for block in blocks if not block.startswith("```")]
+    nodes = [markdown_to_html_node(document) for document in documents]
+
+    stages = {
+        "markdown_to_blocks": lambda: [markdown_to_blocks(document) for document in documents],
+        "block_to_block_type": lambda: [block_to_block_type(block) for block in blocks],
+        "text_to_textnodes": lambda: [text_to_textnodes(text) for text in inline_texts],
+        "markdown_to_html_node": lambda: [markdown_to_html_node(document) for document in documents],
+        "to_html": lambda: [node.to_html() for node in nodes],
+    }
+
+    results = {}
+    for name, fn in stages.items():
+        results[name] = stage_result(timed(fn, repeat), pages, nbytes)
+        print(f"{name:24} {results[name]['pages_per_sec']:>12} pages/s {results[name]['mb_per_sec']:>10} MB/s", file=sys.stderr)
+
+    return results
+
+
+def bench_end_to_end(root, pages, nbytes, jobs):
+    def build():
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            try:
+                site_main.main(["/", "--jobs", str(jobs)])
+            except SystemExit as e:
+                if e.code:
+                    raise RuntimeError("Benchmark build failed") from e
+
+    cwd = os.getcwd()
+    os.chdir(root)
+    try:
+        shutil.rmtree(".build", ignore_errors=True)
+        cold = timed(build, 1)
+        noop = timed(build, 1)
+    finally:
+        os.chdir(cwd)
+
+    results = {
+        "main_cold": stage_result(cold, pages, nbytes),
+        "main_noop": stage_result(noop, pages, nbytes),
+    }
+    for name, result in results.items():
+        print(f"{name:24} {result['pages_per_sec']:>12} pages/s {result['mb_per_sec']:>10} MB/s", file=sys.stderr)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the markdown to HTML pipeline")
+    add_corpus_args(parser)
+    parser.add_argument("--repeat", type=int, default=3, help="repetitions per stage; the best run is reported")
+    parser.add_argument("--jobs", type=int, default=1, help="--jobs passed to the end-to-end build")
+    parser.add_argument("--no-e2e", action="store_true", help="skip the end-to-end main() build")
+    parser.add_argument("--json", dest="json_path", help="write results to this file instead of stdout")
+    args = parser.parse_args()
+
+    generator = CorpusGenerator(seed=args.seed, mix=args.mix, inline=args.inline)
+    documents = [generator.page(args.blocks_per_page) for _ in range(args.pages)]
+    nbytes = sum(len(document.encode("utf-8")) for document in documents)
+
+    results = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "corpus": {
+            "pages": args.pages,
+            "blocks_per_page": args.blocks_per_page,
+            "mix": generator.mix,
+            "inline": args.inline,
+            "seed": args.seed,
+            "mb": round(nbytes / 1e6, 3),
+        },
+        "stages": bench_stages(documents, args.repeat),
+    }
+
+    if not args.no_e2e:
+        with tempfile.TemporaryDirectory() as root:
+            write_corpus(root, args.pages, args.blocks_per_page, CorpusGenerator(seed=args.seed, mix=args.mix, inline=args.inline))
+            results["stages"].update(bench_end_to_end(root, args.pages, nbytes, args.jobs))
+
+    # ru_maxrss only ever grows, so it is reported for the whole run, not per stage
+    results["peak_rss_mb"] = round(peak_rss_mb(), 1)
+
+    output = json.dumps(results, indent=2)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,3 @@
 #!/bin/zsh
 
-python3 ./src/main.py
-cd docs && python3 -m http.server 8888
+python3 ./src/serve.py --watch
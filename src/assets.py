@@ -0,0 +1,76 @@
+import json
+import os
+import struct
+
+from fileio import save_json
+from manifest import hash_file
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp"}
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def png_size(path):
+    # Width and height are the first fields of the IHDR chunk, which must come first
+    with open(path, "rb") as file:
+        header = file.read(24)
+    if len(header) < 24 or header[:8] != PNG_SIGNATURE or header[12:16] != b"IHDR":
+        return None
+    return struct.unpack(">II", header[16:24])
+
+def fingerprint(url, digest):
+    name, ext = os.path.splitext(url)
+    return f"{name}.{digest[:10]}{ext}"
+
+
+# Fingerprints and dimensions of the images under static/, persisted between
+# builds. An image whose size and mtime are unchanged is never read again.
+class AssetStore:
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                self.entries = json.load(file).get("images", {})
+
+    def image(self, src_path, stat):
+        entry = self.entries.get(src_path)
+        if entry is not None and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return entry
+
+        size = png_size(src_path) if src_path.lower().endswith(".png") else None
+        entry = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "hash": hash_file(src_path),
+            "width": size[0] if size else None,
+            "height": size[1] if size else None,
+        }
+        self.entries[src_path] = entry
+        return entry
+
+    def collect(self, static_path):
+        # Maps the site URL of every image to its fingerprinted URL and dimensions
+        assets = {}
+        seen = set()
+        stack = [(static_path, "/")] if os.path.isdir(static_path) else []
+        while stack:
+            path, url = stack.pop()
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        stack.append((entry.path, f"{url}{entry.name}/"))
+                    elif entry.is_file() and os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS:
+                        image = self.image(entry.path, entry.stat())
+                        seen.add(entry.path)
+                        asset = {"url": fingerprint(url + entry.name, image["hash"])}
+                        if image["width"] is not None:
+                            asset["width"] = image["width"]
+                            asset["height"] = image["height"]
+                        assets[url + entry.name] = asset
+
+        self.entries = {path: entry for path, entry in self.entries.items() if path in seen}
+        return dict(sorted(assets.items()))
+
+    def save(self):
+        save_json(self.path, {"images": self.entries})
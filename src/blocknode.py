@@ -9,6 +9,8 @@ class BlockType(Enum):
     ORDERED_LIST = "ordered_list"
 
 class BlockNode:
+    __slots__ = ("text", "block_type")
+
     def __init__(self, text, block_type: BlockType):
         self.text = text
         self.block_type = block_type
@@ -0,0 +1,147 @@
+import os
+import threading
+
+import helper
+from feeds import BLOG_DIR, page_url, site_indexes, site_page
+from fileio import file_stamp
+from main import build, collect_pages
+from manifest import Manifest
+from pipeline import read_meta, read_source, render_body
+from template import TemplateRegistry
+
+
+# The asset map, basepath and highlight cache live in helper for the whole process,
+# so builders, e.g. on the threads of a preview server, take turns rendering
+RENDER_LOCK = threading.RLock()
+
+
+# Renders pages and site indexes into memory instead of ./docs, for embedding the
+# generator in another process. The compiled layouts and the rendered page bodies
+# stay warm between calls and are only redone when their files change on disk.
+class Builder:
+    def __init__(self, basepath="/", output_dir="./docs", static_path="./static", content_path="./content", template_path="./template.html", layouts_path="./layouts", cache=None, highlights=None, asset_store=None, minify=False, site_url=None, posts_per_page=10, drafts=False, build_dir=None):
+        self.basepath = basepath
+        self.output_dir = output_dir
+        # The manifest and dependency graph of build(); next to the output directory by
+        # default, so ./docs keeps using ./.build like the command line
+        self.build_dir = build_dir if build_dir is not None else os.path.join(os.path.dirname(os.path.abspath(output_dir)), ".build")
+        self.static_path = static_path
+        self.content_path = content_path
+        self.template_path = template_path
+        self.layouts_path = layouts_path
+        self.cache = cache
+        self.highlights = highlights
+        self.asset_store = asset_store
+        self.minify = minify
+        self.site_url = site_url
+        self.posts_per_page = posts_per_page
+        self.drafts = drafts
+        self.registry = None
+        self.assets_key = None
+        # source path -> (stamp, render key, title, summary, body, front matter)
+        self.bodies = {}
+
+    def refresh(self):
+        # Picks up layout, image and basepath changes; compiled layouts whose files are unchanged are kept
+        with RENDER_LOCK:
+            helper.set_highlight_cache(self.highlights)
+            # Reset even without an asset store, so another builder's map is never used
+            if self.asset_store is not None and os.path.exists(self.static_path):
+                helper.set_image_assets(self.asset_store.collect(self.static_path))
+            else:
+                helper.set_image_assets(None)
+
+            if self.registry is None or self.assets_key != helper.IMAGE_ASSETS_KEY:
+                self.registry = TemplateRegistry(self.template_path, self.layouts_path, self.content_path, self.basepath, helper.IMAGE_ASSETS, self.minify)
+                self.assets_key = helper.IMAGE_ASSETS_KEY
+            else:
+                self.registry.refresh()
+            return self.registry
+
+    def pages(self):
+        # (source path, output path relative to the site root) for every page
+        pages = collect_pages(self.content_path, self.output_dir, makedirs=False, drafts=self.drafts)
+        return [(s, os.path.relpath(d, self.output_dir).replace(os.sep, "/")) for s, d in pages]
+
+    def render_body(self, source):
+        # Bodies resolve URLs against this builder's basepath, and are memoized by it
+        with RENDER_LOCK, helper.use_basepath(self.basepath):
+            stamp = file_stamp(source)
+            memo = self.bodies.get(source)
+            if memo is not None and memo[:2] == (stamp, helper.RENDER_KEY):
+                return memo[2:]
+
+            data = read_source(source)
+            key = self.cache.key([data], helper.RENDER_KEY) if self.cache is not None else None
+            entry = self.cache.get(key) if self.cache is not None else None
+            if entry is None:
+                title, summary, body, collected = render_body(data)
+                entry = title, summary, body, collected["meta"]
+                if self.cache is not None:
+                    self.cache.put(key, title, body, summary)
+            else:
+                entry = (*entry, read_meta(data))
+
+            self.bodies[source] = (stamp, helper.RENDER_KEY, *entry)
+            return entry
+
+    def render_page(self, source):
+        with RENDER_LOCK:
+            registry = self.refresh()
+            title, _, body, meta = self.render_body(source)
+            template = registry.get(registry.select(source, meta))
+            return template.render(Title=helper.escape_html(title), Content=body)
+
+    def write_site(self, write):
+        # Passes (output path relative to the site root, text) of every page and site
+        # index to `write`; a failing page is reported and left out, like in build()
+        with RENDER_LOCK:
+            registry = self.refresh()
+            pages = self.pages()
+            entries = []
+            failures = []
+            for source, relpath in pages:
+                try:
+                    title, summary, body, meta = self.render_body(source)
+                    template = registry.get(registry.select(source, meta))
+                    write(relpath, template.render(Title=helper.escape_html(title), Content=body))
+                except Exception as e:
+                    failures.append((source, relpath, f"{type(e).__name__}: {e}"))
+                    continue
+                entry = {"title": title, "summary": summary, "mtime": os.path.getmtime(source), "meta": meta}
+                entries.append(site_page(page_url(relpath, os.curdir), entry))
+
+            entries.sort(key=lambda page: page["url"])
+            template = registry.get(registry.select(os.path.join(self.content_path, BLOG_DIR, "index.md")))
+            for relpath, text in site_indexes(entries, template, self.basepath, self.site_url, self.posts_per_page).items():
+                write(relpath.replace(os.sep, "/"), text)
+
+            # Bodies of removed pages would otherwise stay in memory for good
+            sources = {source for source, _ in pages}
+            self.bodies = {source: memo for source, memo in self.bodies.items() if source in sources}
+            return failures
+
+    def render_site(self):
+        outputs = {}
+        failures = self.write_site(outputs.__setitem__)
+        return outputs, failures
+
+    def build(self, **options):
+        # The on-disk build of main.py with this builder's paths and settings
+        options.setdefault("manifest", Manifest(os.path.join(self.build_dir, "manifest.json"), self.output_dir))
+        return build(
+            self.basepath,
+            output_dir=self.output_dir,
+            static_path=self.static_path,
+            content_path=self.content_path,
+            template_path=self.template_path,
+            layouts_path=self.layouts_path,
+            cache=self.cache,
+            highlights=self.highlights,
+            asset_store=self.asset_store,
+            minify=self.minify,
+            site_url=self.site_url,
+            posts_per_page=self.posts_per_page,
+            drafts=self.drafts,
+            **options,
+        )
@@ -0,0 +1,117 @@
+import contextlib
+import hashlib
+import os
+import threading
+
+from helper import PARSER_VERSION
+
+# Bump whenever the layout of an entry file changes
+ENTRY_FORMAT = 2
+
+
+# Rendered page bodies keyed by a hash of the markdown and the parser version.
+# An entry is the page title and summary, one line each, followed by the body.
+# Entries are renamed into place, so concurrent workers only ever see complete
+# entries; hits refresh the entry mtime, which evict() uses as LRU order.
+class RenderCache:
+    def __init__(self, path, max_bytes=512 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+
+    def key(self, chunks, context=""):
+        # chunks are the bytes of the markdown source, e.g. [data] or read_chunks(path)
+        digest = hashlib.sha256(f"{PARSER_VERSION}\0{ENTRY_FORMAT}\0{context}\0".encode("utf-8"))
+        for chunk in chunks:
+            digest.update(chunk)
+        return digest.hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.path, key[:2], key[2:])
+
+    def get(self, key):
+        path = self.entry_path(key)
+        try:
+            with open(path, encoding="utf-8", newline="") as file:
+                title = file.readline()[:-1]
+                summary = file.readline()[:-1]
+                body = file.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+
+        return title, summary, body
+
+    def open(self, key):
+        path = self.entry_path(key)
+        try:
+            file = open(path, encoding="utf-8", newline="")
+        except FileNotFoundError:
+            return None
+
+        title = file.readline()[:-1]
+        summary = file.readline()[:-1]
+        os.utime(path)
+        return title, summary, file
+
+    @contextlib.contextmanager
+    def writer(self, key, title, summary=""):
+        path = self.entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8", newline="") as file:
+                file.write(f"{title}\n{summary}\n")
+                yield file
+            os.replace(tmp_path, path)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(tmp_path)
+            raise
+
+    def put(self, key, title, body, summary=""):
+        with self.writer(key, title, summary) as file:
+            file.write(body)
+
+    def evict(self):
+        entries = []
+        total = 0
+        if not os.path.isdir(self.path):
+            return 0
+
+        for shard in os.scandir(self.path):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".tmp"):
+                    continue
+                with contextlib.suppress(FileNotFoundError):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                    total += stat.st_size
+
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(path)
+                removed += 1
+            total -= size
+
+        return removed
+
+
+def iter_chunks(file, size=1 << 16):
+    # Chunks end right after a ">", so no tag or attribute is ever split between two chunks
+    carry = ""
+    for chunk in iter(lambda: file.read(size), ""):
+        chunk = carry + chunk
+        cut = chunk.rfind(">") + 1
+        if cut:
+            carry = chunk[cut:]
+            yield chunk[:cut]
+        else:
+            carry = chunk
+
+    if carry:
+        yield carry
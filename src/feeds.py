@@ -0,0 +1,174 @@
+import datetime
+import email.utils
+import os
+from xml.sax.saxutils import escape
+
+from helper import escape_attr, escape_html
+from leafnode import LeafNode
+from parentnode import ParentNode
+
+BLOG_DIR = "blog"
+
+
+def page_url(dest_path, output_dir):
+    relpath = os.path.relpath(dest_path, output_dir).replace(os.sep, "/")
+    if relpath == "index.html":
+        return "/"
+    if relpath.endswith("/index.html"):
+        return "/" + relpath[:-len("index.html")]
+    return "/" + relpath
+
+def absolute_url(site_url, basepath, url):
+    return site_url.rstrip("/") + basepath.rstrip("/") + url
+
+def published(entry):
+    # The front-matter date when it's a valid ISO date, else the source mtime
+    date = entry.get("meta", {}).get("date")
+    if date is not None:
+        try:
+            value = datetime.datetime.fromisoformat(str(date))
+        except ValueError:
+            return entry["mtime"]
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=datetime.timezone.utc)
+        return value.timestamp()
+    return entry["mtime"]
+
+def site_page(url, entry):
+    return {
+        "url": url,
+        "title": entry["title"],
+        "summary": entry["summary"],
+        "mtime": entry["mtime"],
+        "date": published(entry),
+    }
+
+def site_pages(pages, manifest, output_dir):
+    # Metadata recorded by the main pass; pages that failed to render have none
+    result = []
+    for _, dest in pages:
+        entry = manifest.get(dest)
+        if entry is None or "title" not in entry:
+            continue
+        result.append(site_page(page_url(dest, output_dir), entry))
+
+    return sorted(result, key=lambda page: page["url"])
+
+def blog_posts(pages):
+    prefix = f"/{BLOG_DIR}/"
+    posts = [page for page in pages if page["url"].startswith(prefix) and page["url"] != prefix]
+    return sorted(posts, key=lambda page: (-page["date"], page["url"]))
+
+def sitemap_xml(pages, site_url, basepath):
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">',
+    ]
+    for page in pages:
+        lastmod = datetime.datetime.fromtimestamp(page["mtime"], datetime.timezone.utc).date().isoformat()
+        lines.append(f"  <url><loc>{escape(absolute_url(site_url, basepath, page['url']))}</loc><lastmod>{lastmod}</lastmod></url>")
+    lines.append("</urlset>")
+    return "\n".join(lines) + "\n"
+
+def rss_xml(posts, site_url, basepath, title="Blog"):
+    link = absolute_url(site_url, basepath, f"/{BLOG_DIR}/")
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<rss version="2.0">',
+        "<channel>",
+        f"  <title>{escape(title)}</title>",
+        f"  <link>{escape(link)}</link>",
+        f"  <description>{escape(title)}</description>",
+    ]
+    # The newest post dates the feed, so an unchanged blog yields an unchanged file
+    if posts:
+        lines.append(f"  <lastBuildDate>{email.utils.formatdate(posts[0]['date'], usegmt=True)}</lastBuildDate>")
+    for post in posts:
+        url = escape(absolute_url(site_url, basepath, post["url"]))
+        lines.append("  <item>")
+        lines.append(f"    <title>{escape(post['title'])}</title>")
+        lines.append(f"    <link>{url}</link>")
+        lines.append(f"    <guid>{url}</guid>")
+        lines.append(f"    <pubDate>{email.utils.formatdate(post['date'], usegmt=True)}</pubDate>")
+        lines.append(f"    <description>{escape(post['summary'])}</description>")
+        lines.append("  </item>")
+    lines.extend(["</channel>", "</rss>"])
+    return "\n".join(lines) + "\n"
+
+def listing_url(number):
+    return f"/{BLOG_DIR}/" if number == 1 else f"/{BLOG_DIR}/page/{number}/"
+
+def listing_href(url, basepath):
+    return escape_attr(basepath + url[1:])
+
+def listing_node(posts, number, count, basepath="/"):
+    # Titles and summaries are plain text and URLs root-relative, so both are escaped
+    # and resolved here, as helper.text_node_to_html_node does for pages
+    items = []
+    for post in posts:
+        children = [ParentNode("h2", [LeafNode("a", escape_html(post["title"]), {"href": listing_href(post["url"], basepath)})])]
+        if post["summary"]:
+            children.append(LeafNode("p", escape_html(post["summary"])))
+        items.append(ParentNode("li", children))
+
+    children = [ParentNode("ul", items)]
+    links = []
+    if number > 1:
+        links.append(LeafNode("a", "Newer posts", {"href": listing_href(listing_url(number - 1), basepath)}))
+    if number < count:
+        links.append(LeafNode("a", "Older posts", {"href": listing_href(listing_url(number + 1), basepath)}))
+    if links:
+        children.append(ParentNode("nav", links))
+
+    return ParentNode("div", children)
+
+def listing_pages(posts, per_page, basepath="/"):
+    count = max(1, -(-len(posts) // per_page))
+    for number in range(1, count + 1):
+        chunk = posts[(number - 1) * per_page:number * per_page]
+        yield listing_url(number), listing_node(chunk, number, count, basepath)
+
+def write_if_changed(path, text):
+    # Leaves unchanged outputs untouched so no-op builds stay no-ops for rsync and browsers
+    try:
+        with open(path, encoding="utf-8", newline="") as file:
+            if file.read() == text:
+                return False
+    except FileNotFoundError:
+        pass
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8", newline="") as file:
+        file.write(text)
+    os.replace(tmp_path, path)
+    return True
+
+def site_indexes(entries, template, basepath, site_url, per_page=10):
+    # Output path relative to the site root -> text of sitemap.xml, the blog feed and blog listings.
+    # The sitemap and feed need absolute URLs, so without a site_url they're left out.
+    posts = blog_posts(entries)
+    outputs = {}
+    if site_url:
+        outputs["sitemap.xml"] = sitemap_xml(entries, site_url, basepath)
+        if posts:
+            outputs[os.path.join(BLOG_DIR, "feed.xml")] = rss_xml(posts, site_url, basepath)
+
+    # A hand-written content/blog/index.md takes precedence over the generated listings
+    if posts and not any(page["url"] == f"/{BLOG_DIR}/" for page in entries):
+        for url, node in listing_pages(posts, per_page, basepath):
+            outputs[os.path.join(url.strip("/"), "index.html")] = template.render(Title="Blog", Content=node.to_html())
+
+    return outputs
+
+def write_site_indexes(pages, manifest, output_dir, template, basepath, site_url, per_page=10):
+    # Built from the metadata the main pass left in the manifest instead of reading any source again
+    entries = site_pages(pages, manifest, output_dir)
+    written = []
+    for relpath, text in site_indexes(entries, template, basepath, site_url, per_page).items():
+        path = os.path.join(output_dir, relpath)
+        if write_if_changed(path, text):
+            written.append(path)
+        manifest.record(path, {"source": "generated"})
+
+    return written
@@ -0,0 +1,31 @@
+import json
+import os
+
+
+def save_json(path, data, compact=False):
+    # Written to a temporary file and renamed into place, so a crash mid-write
+    # never leaves a truncated store behind for the next build to load
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        if compact:
+            json.dump(data, file, separators=(",", ":"), sort_keys=True)
+        else:
+            json.dump(data, file, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def file_stamp(path):
+    # Changes whenever the file is rewritten, without reading it; None for a missing file
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def read_chunks(path, size=1 << 16):
+    with open(path, "rb") as file:
+        yield from iter(lambda: file.read(size), b"")
+
+def decode_text(data):
+    # Same text as open(path, encoding="utf-8").read(), including universal newlines
+    return data.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
@@ -0,0 +1,85 @@
+import io
+import re
+
+FENCE = "---"
+# A header that long is a missing closing fence rather than metadata
+MAX_LINES = 256
+
+KEY_RE = re.compile(r"([A-Za-z_][\w-]*)\s*:(?:\s+(.*))?$")
+INTEGER_RE = re.compile(r"[-+]?\d+$")
+CONSTANTS = {"true": True, "yes": True, "false": False, "no": False, "null": None, "~": None}
+
+
+def parse_scalar(text):
+    text = text.strip()
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in "\"'":
+        return text[1:-1]
+    if text.lower() in CONSTANTS:
+        return CONSTANTS[text.lower()]
+    if INTEGER_RE.match(text):
+        return int(text)
+    return text
+
+def parse_value(text):
+    text = text.strip()
+    if text.startswith("[") and text.endswith("]"):
+        return [parse_scalar(item) for item in text[1:-1].split(",") if item.strip()]
+    return parse_scalar(text)
+
+def parse_front_matter(lines):
+    # The YAML subset pages need: `key: value` scalars, [inline, lists] and
+    # `- item` block lists; anything else is rejected rather than guessed at
+    meta = {}
+    key = None
+    for number, line in enumerate(lines, 2):
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            continue
+
+        if stripped.startswith("- ") and key is not None and isinstance(meta[key], list):
+            meta[key].append(parse_scalar(stripped[2:]))
+            continue
+
+        match = KEY_RE.match(line.rstrip())
+        if match is None:
+            raise ValueError(f"Invalid front matter on line {number}: {line.rstrip()}")
+        key = match.group(1)
+        # An empty value starts a block list
+        meta[key] = [] if match.group(2) is None else parse_value(match.group(2))
+
+    return meta
+
+def read_front_matter(file):
+    # Reads only up to the closing fence and leaves `file` at the start of the
+    # markdown; a file without front matter is rewound to where it started
+    start = file.tell()
+    if file.readline().rstrip("\n") != FENCE:
+        file.seek(start)
+        return {}
+
+    lines = []
+    for _ in range(MAX_LINES):
+        line = file.readline()
+        if not line:
+            break
+        if line.rstrip("\n") == FENCE:
+            return parse_front_matter(lines)
+        lines.append(line)
+
+    raise ValueError("Front matter is missing its closing fence.")
+
+def split_front_matter(markdown):
+    file = io.StringIO(markdown)
+    meta = read_front_matter(file)
+    return meta, markdown[file.tell():]
+
+def load_front_matter(path):
+    with open(path, encoding="utf-8") as file:
+        return read_front_matter(file)
+
+def is_draft(path):
+    try:
+        return load_front_matter(path).get("draft") is True
+    except (OSError, ValueError):
+        # Left to fail where the page itself is generated, so it's reported there
+        return False
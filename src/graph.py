@@ -0,0 +1,156 @@
+import argparse
+import contextlib
+import json
+import os
+import posixpath
+import sys
+from urllib.parse import urljoin, urlsplit
+
+from feeds import page_url
+from fileio import save_json
+from helper import observe_textnodes
+from textnode import TextType
+
+EDGE_KINDS = ("template", "image", "link")
+
+
+class PageLinks:
+    def __init__(self):
+        # Dicts as ordered sets: a page repeating a link keeps one copy, so
+        # collecting stays bounded by the distinct URLs rather than the page size
+        self.seen_links = {}
+        self.seen_images = {}
+
+    @property
+    def links(self):
+        return list(self.seen_links)
+
+    @property
+    def images(self):
+        return list(self.seen_images)
+
+    def add(self, text_nodes):
+        for node in text_nodes:
+            if node.text_type == TextType.LINK:
+                self.seen_links.setdefault(node.url)
+            elif node.text_type == TextType.IMAGE:
+                self.seen_images.setdefault(node.url)
+
+    @contextlib.contextmanager
+    def collect(self):
+        with observe_textnodes(self.add):
+            yield self
+
+
+def site_path(url, base_url="/"):
+    # The path a link points at within the site, or None for external and fragment-only links
+    parts = urlsplit(url)
+    if parts.scheme or parts.netloc or not parts.path:
+        return None
+    return posixpath.normpath(urljoin(base_url, parts.path))
+
+def output_paths(manifest, output_dir, static_path):
+    # Site path -> graph node: the source of a page or static file, else the output itself
+    paths = {}
+    for dest, entry in manifest.entries.items():
+        url = page_url(dest, output_dir)
+        node = entry.get("source", "generated")
+        node = dest if node == "generated" else os.path.normpath(node)
+        paths[posixpath.normpath(url)] = node
+        if url.endswith("/"):
+            paths[posixpath.normpath(url + "index.html")] = node
+
+        # Links and images naming a fingerprinted static file by its own name are
+        # rewritten to its published URL as pages render, so that name reaches it too
+        relpath = os.path.relpath(node, static_path)
+        if not relpath.startswith(os.pardir):
+            paths["/" + relpath.replace(os.sep, "/")] = node
+
+    return paths
+
+
+# Edges page -> template, page -> image and page -> linked page, keyed by page
+# source path and persisted between builds, plus the links that lead nowhere.
+class DependencyGraph:
+    def __init__(self, path):
+        self.path = path
+        self.pages = {}
+        self.broken = {}
+
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                data = json.load(file)
+            self.pages = data.get("pages", {})
+            self.broken = data.get("broken", {})
+
+    def update(self, pages, manifest, output_dir, static_path, template_path):
+        # Built from the links and images each page recorded in the manifest while rendering
+        paths = output_paths(manifest, output_dir, static_path)
+        self.pages = {}
+        self.broken = {}
+        for source, dest in pages:
+            entry = manifest.get(dest)
+            if entry is None or "links" not in entry:
+                continue
+
+            base_url = page_url(dest, output_dir)
+            # The layout and partials the page was rendered with, or the one template before layouts existed
+            templates = entry.get("templates", [template_path])
+            edges = {"template": sorted({os.path.normpath(path) for path in templates}), "image": set(), "link": set()}
+            broken = []
+            for kind, urls in (("image", entry["images"]), ("link", entry["links"])):
+                for url in urls:
+                    path = site_path(url, base_url)
+                    if path is None:
+                        continue
+                    if path in paths:
+                        edges[kind].add(paths[path])
+                    else:
+                        broken.append(url)
+
+            self.pages[os.path.normpath(source)] = {kind: sorted(nodes) for kind, nodes in edges.items()}
+            if broken:
+                self.broken[os.path.normpath(source)] = broken
+
+    def dependents(self, node, kinds=EDGE_KINDS):
+        node = os.path.normpath(node)
+        return sorted(page for page, edges in self.pages.items() if any(node in edges[kind] for kind in kinds))
+
+    def affected(self, path):
+        # Pages whose output embeds `path`; pages that merely link to it are dependents(path, ("link",))
+        path = os.path.normpath(path)
+        pages = set(self.dependents(path, ("template", "image")))
+        if path in self.pages:
+            pages.add(path)
+        return sorted(pages)
+
+    def broken_links(self):
+        return [(page, url) for page, urls in sorted(self.broken.items()) for url in urls]
+
+    def save(self):
+        save_json(self.path, {"pages": self.pages, "broken": self.broken})
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Query the dependency graph recorded by the last build")
+    parser.add_argument("paths", nargs="*", help="list the pages that must rebuild if these files change")
+    parser.add_argument("--links-to", action="store_true", help="list the pages linking to the given paths instead")
+    parser.add_argument("--broken", action="store_true", help="list broken internal links")
+    parser.add_argument("--graph", default="./.build/graph.json")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    graph = DependencyGraph(args.graph)
+
+    for path in args.paths:
+        pages = graph.dependents(path, ("link",)) if args.links_to else graph.affected(path)
+        for page in pages:
+            print(f"{path}: {page}")
+
+    if args.broken:
+        for page, url in graph.broken_links():
+            print(f"{page}: broken link {url}")
+
+if __name__ == "__main__":
+    main()
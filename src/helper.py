@@ -1,9 +1,105 @@
+import contextlib
+import hashlib
+import json
 import re
+import threading
 from blocknode import BlockType
-from leafnode import LeafNode
+from highlight import HIGHLIGHT_VERSION, highlight
+from leafnode import LeafNode, SharedLeafNode
 from parentnode import ParentNode
 from textnode import TextNode, TextType
 
+# Bump whenever a change alters the HTML produced for the same markdown
+PARSER_VERSION = 5
+
+SUMMARY_LENGTH = 280
+
+# Site URL -> {"url", "width", "height"} for fingerprinted images, see assets.py.
+# IMAGE_ASSETS_KEY identifies the map, since it changes the HTML of any page with images.
+IMAGE_ASSETS = {}
+IMAGE_ASSETS_KEY = ""
+# Root-relative link and image URLs are resolved against BASEPATH as their nodes are built;
+# it's only set for the duration of a render, see use_basepath(). RENDER_KEY identifies
+# both settings and the highlighter version for render cache keys, since each changes
+# page bodies.
+BASEPATH = "/"
+RENDER_KEY = f"{BASEPATH}\0{IMAGE_ASSETS_KEY}\0{HIGHLIGHT_VERSION}"
+HIGHLIGHTS = None
+
+# (character, entity) pairs; "&" comes first so entities aren't escaped twice
+TEXT_ESCAPES = (("&", "&amp;"), ("<", "&lt;"), (">", "&gt;"))
+ATTR_ESCAPES = TEXT_ESCAPES + (('"', "&quot;"),)
+
+# Link and image leaves are interned by (type, text, url, basepath): the same nav link or
+# badge on thousands of pages is allocated and serialized once. The table depends on the
+# asset map, so it's reset along with it, and stops growing at MAX_SHARED_LEAVES.
+SHARED_LEAVES = {}
+MAX_SHARED_LEAVES = 1 << 16
+LEAF_COUNTS = [0, 0]
+
+# Per thread, the observers handed the TextNodes produced there, see observe_textnodes()
+OBSERVERS = threading.local()
+
+def set_image_assets(assets):
+    global IMAGE_ASSETS, IMAGE_ASSETS_KEY, RENDER_KEY
+    previous = IMAGE_ASSETS_KEY
+    IMAGE_ASSETS = assets or {}
+    IMAGE_ASSETS_KEY = hashlib.sha256(json.dumps(IMAGE_ASSETS, sort_keys=True).encode("utf-8")).hexdigest() if IMAGE_ASSETS else ""
+    RENDER_KEY = render_key()
+    if IMAGE_ASSETS_KEY != previous:
+        SHARED_LEAVES.clear()
+
+@contextlib.contextmanager
+def use_basepath(basepath):
+    # Nodes built inside the block resolve root-relative URLs against `basepath`;
+    # the previous basepath is restored on exit
+    global BASEPATH, RENDER_KEY
+    previous = BASEPATH
+    BASEPATH = basepath
+    RENDER_KEY = render_key()
+    try:
+        yield
+    finally:
+        BASEPATH = previous
+        RENDER_KEY = render_key()
+
+def render_key():
+    return f"{BASEPATH}\0{IMAGE_ASSETS_KEY}\0{HIGHLIGHT_VERSION}"
+
+def take_leaf_counts():
+    # (hits, misses) of the shared leaf table since the last call
+    counts = tuple(LEAF_COUNTS)
+    LEAF_COUNTS[:] = [0, 0]
+    return counts
+
+
+def escape_html(text, table=TEXT_ESCAPES):
+    # Most text has nothing to escape, and a membership test per character is far
+    # cheaper than rebuilding the string, so only characters present are replaced
+    for char, entity in table:
+        if char in text:
+            text = text.replace(char, entity)
+    return text
+
+def escape_attr(value):
+    return escape_html(value, ATTR_ESCAPES)
+
+def resolve_url(url):
+    # Root-relative URLs move under the basepath; protocol-relative ones are external
+    if BASEPATH == "/" or not url.startswith("/") or url.startswith("//"):
+        return url
+    return BASEPATH + url[1:]
+
+
+def set_highlight_cache(cache):
+    global HIGHLIGHTS
+    HIGHLIGHTS = cache
+
+def highlight_code(code, language):
+    if HIGHLIGHTS is None:
+        return highlight(code, language)
+    return HIGHLIGHTS.highlight(code, language)
+
 
 def text_node_to_html_node(text_node):
     if text_node.text_type not in TextType:
@@ -11,22 +107,46 @@ def text_node_to_html_node(text_node):
 
     match text_node.text_type:
         case TextType.TEXT:
-            return LeafNode(tag=None, value=text_node.text)
+            return LeafNode(tag=None, value=escape_html(text_node.text))
         case TextType.BOLD:
-            return LeafNode(tag="b",value=text_node.text)
+            return LeafNode(tag="b",value=escape_html(text_node.text))
         case TextType.ITALIC:
-            return LeafNode(tag="i",value=text_node.text)
+            return LeafNode(tag="i",value=escape_html(text_node.text))
         case TextType.CODE:
-            return LeafNode(tag="code",value=text_node.text)
-        case TextType.LINK:
-            return LeafNode(tag="a",value=text_node.text, props={
-                "href": text_node.url
-            })
-        case TextType.IMAGE:
-            return LeafNode(tag="img",value="", props={
-                "src": text_node.url,
-                "alt": text_node.text
-            })
+            return LeafNode(tag="code",value=escape_html(text_node.text))
+        case TextType.LINK | TextType.IMAGE:
+            key = (text_node.text_type, text_node.text, text_node.url, BASEPATH)
+            leaf = SHARED_LEAVES.get(key)
+            if leaf is not None:
+                LEAF_COUNTS[0] += 1
+                return leaf
+            LEAF_COUNTS[1] += 1
+            leaf = shared_leaf_node(text_node)
+            if len(SHARED_LEAVES) < MAX_SHARED_LEAVES:
+                SHARED_LEAVES[key] = leaf
+            return leaf
+
+def shared_leaf_node(text_node):
+    # Values and props come out escaped and URLs resolved, so the HTML needs no later pass
+    if text_node.text_type == TextType.LINK:
+        # Fingerprinted images are only published under their new name, so links follow them too
+        asset = IMAGE_ASSETS.get(text_node.url)
+        url = text_node.url if asset is None else asset["url"]
+        return SharedLeafNode(tag="a",value=escape_html(text_node.text), props={
+            "href": escape_attr(resolve_url(url))
+        })
+
+    asset = IMAGE_ASSETS.get(text_node.url)
+    if asset is not None:
+        props = {"src": escape_attr(resolve_url(asset["url"])), "alt": escape_attr(text_node.text)}
+        if "width" in asset:
+            props["width"] = str(asset["width"])
+            props["height"] = str(asset["height"])
+        return SharedLeafNode(tag="img", value="", props=props)
+    return SharedLeafNode(tag="img",value="", props={
+        "src": escape_attr(resolve_url(text_node.url)),
+        "alt": escape_attr(text_node.text)
+    })
 
 def split_nodes_delimiter(old_nodes, delimiter, text_type):
     new_nodes = []
@@ -44,30 +164,27 @@ def split_nodes_delimiter(old_nodes, delimiter, text_type):
 
     return new_nodes
 
+IMAGE_RE = re.compile(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)")
+LINK_RE = re.compile(r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)")
+
 def extract_markdown_images(text):
-    matches = re.findall(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)", text)
-    return matches
+    return IMAGE_RE.findall(text)
 
 def extract_markdown_links(text):
-    matches = re.findall(r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)", text)
-    return matches
+    return LINK_RE.findall(text)
 
-def split_nodes_image(old_nodes):
+def split_nodes_pattern(old_nodes, pattern, text_type):
     new_nodes = []
     for node in old_nodes:
         if node.text_type == TextType.TEXT:
             text = node.text
-            matches = extract_markdown_images(text)
             last_idx = 0
 
-            for alt, src in matches:
-                img_markdown = f"![{alt}]({src})"
-                idx = text.find(img_markdown, last_idx)
-                if idx != -1:
-                    if idx > last_idx:
-                        new_nodes.append(TextNode(text[last_idx:idx], TextType.TEXT))
-                    new_nodes.append(TextNode(alt, TextType.IMAGE, src))
-                    last_idx = idx + len(img_markdown)
+            for match in pattern.finditer(text):
+                if match.start() > last_idx:
+                    new_nodes.append(TextNode(text[last_idx:match.start()], TextType.TEXT))
+                new_nodes.append(TextNode(match.group(1), text_type, match.group(2)))
+                last_idx = match.end()
 
             if last_idx < len(text):
                 new_nodes.append(TextNode(text[last_idx:], TextType.TEXT))
@@ -76,44 +193,70 @@ def split_nodes_image(old_nodes):
 
     return new_nodes
 
-def split_nodes_link(old_nodes):
-    new_nodes = []
-    for node in old_nodes:
-        if node.text_type == TextType.TEXT:
-            text = node.text
-            matches = extract_markdown_links(text)
-            last_idx = 0
-
-            for alt, src in matches:
-                link_markdown = f"[{alt}]({src})"
-                idx = text.find(link_markdown, last_idx)
-                if idx != -1:
-                    if idx > last_idx:
-                        new_nodes.append(TextNode(text[last_idx:idx], TextType.TEXT))
-                    new_nodes.append(TextNode(alt, TextType.LINK, src))
-                    last_idx = idx + len(link_markdown)
-
-            if last_idx < len(text):
-                new_nodes.append(TextNode(text[last_idx:], TextType.TEXT))
-        else:
-            new_nodes.append(node)
+def split_nodes_image(old_nodes):
+    return split_nodes_pattern(old_nodes, IMAGE_RE, TextType.IMAGE)
 
-    return new_nodes
+def split_nodes_link(old_nodes):
+    return split_nodes_pattern(old_nodes, LINK_RE, TextType.LINK)
+
+INLINE_RE = re.compile(
+    r"!\[(?P<image_alt>[^\[\]]*)\]\((?P<image_url>[^\(\)]*)\)"
+    r"|(?<!!)\[(?P<link_text>[^\[\]]*)\]\((?P<link_url>[^\(\)]*)\)"
+)
+
+INLINE_DELIMITERS = (("**", TextType.BOLD), ("_", TextType.ITALIC), ("`", TextType.CODE))
+
+def append_delimited(text_nodes, text, level=0):
+    # The split_nodes_delimiter passes over one piece of text, without the
+    # intermediate node lists: odd parts of each split are spans of that type
+    if level == len(INLINE_DELIMITERS):
+        text_nodes.append(TextNode(text, TextType.TEXT))
+        return
+    delimiter, text_type = INLINE_DELIMITERS[level]
+    for i, part in enumerate(text.split(delimiter)):
+        if i % 2:
+            text_nodes.append(TextNode(part, text_type))
+        elif part:
+            append_delimited(text_nodes, part, level + 1)
 
 def text_to_textnodes(text):
-    text_nodes = split_nodes_link(split_nodes_image([TextNode(text, TextType.TEXT)]))
+    # Same nodes as the chained split_nodes_* passes: images and links are taken
+    # first in one scan, so a delimiter never reaches into them, and only the
+    # text between them is split on ** then _ then `
+    text_nodes = []
+    last_idx = 0
+
+    for token in INLINE_RE.finditer(text):
+        start = token.start()
+        if start > last_idx:
+            append_delimited(text_nodes, text[last_idx:start])
+
+        if token.lastgroup == "image_url":
+            text_nodes.append(TextNode(token["image_alt"], TextType.IMAGE, token["image_url"]))
+        else:
+            text_nodes.append(TextNode(token["link_text"], TextType.LINK, token["link_url"]))
 
-    text_type_delimiter_map = {
-        TextType.BOLD: "**",
-        TextType.ITALIC: "_",
-        TextType.CODE: "`"
-    }
+        last_idx = token.end()
 
-    for text_type in text_type_delimiter_map:
-        text_nodes = split_nodes_delimiter(text_nodes, text_type_delimiter_map[text_type], text_type)
+    if last_idx < len(text):
+        append_delimited(text_nodes, text[last_idx:])
 
+    for observer in getattr(OBSERVERS, "active", ()):
+        observer(text_nodes)
     return text_nodes
 
+@contextlib.contextmanager
+def observe_textnodes(observer):
+    # Hands every TextNode list produced on this thread while rendering to
+    # observer(text_nodes); pages rendered on other threads are never seen
+    if not hasattr(OBSERVERS, "active"):
+        OBSERVERS.active = []
+    OBSERVERS.active.append(observer)
+    try:
+        yield
+    finally:
+        OBSERVERS.active.remove(observer)
+
 def markdown_to_blocks(markdown):
     blocks = list(
         filter(
@@ -127,22 +270,47 @@ def markdown_to_blocks(markdown):
 
     return blocks
 
-def block_to_block_type(block):
-    if re.match(r"^#{1,6}\s+.+", block):
-        return BlockType.HEADING
-
-    if block.startswith("```") and block.endswith("```"):
-        return BlockType.CODE
+def iter_blocks(lines):
+    # Streaming counterpart of markdown_to_blocks: blank lines end a block, so only
+    # one block is held in memory at a time
+    block = []
+    for line in lines:
+        if line == "\n":
+            text = "".join(block).strip()
+            if text:
+                yield text
+            block = []
+        else:
+            block.append(line)
 
-    lines = block.split('\n')
-    if all(line.startswith('>') for line in lines):
-        return BlockType.QUOTE
+    text = "".join(block).strip()
+    if text:
+        yield text
 
-    if all(line.startswith('- ') for line in lines):
-        return BlockType.UNORDERED_LIST
+HEADING_RE = re.compile(r"#{1,6}\s+.+")
+FENCE_LANGUAGE_RE = re.compile(r"[A-Za-z][\w+#.-]*")
+ORDERED_LIST_RE = re.compile(r"\d+\.[^\S\n]+.*(?:\n\d+\.[^\S\n]+.*)*")
 
-    if len(lines) > 0 and all(re.match(r'^\d+\.\s+', line) for line in lines):
-        return BlockType.ORDERED_LIST
+def block_to_block_type(block):
+    # Every block type is decided by its first character, so most blocks
+    # never reach a regex and none of them are split into lines
+    first = block[:1]
+
+    if first == "#":
+        if HEADING_RE.match(block):
+            return BlockType.HEADING
+    elif first == "`":
+        if block.startswith("```") and block.endswith("```"):
+            return BlockType.CODE
+    elif first == ">":
+        if block.count("\n") == block.count("\n>"):
+            return BlockType.QUOTE
+    elif first == "-":
+        if block.startswith("- ") and block.count("\n") == block.count("\n- "):
+            return BlockType.UNORDERED_LIST
+    elif first.isdecimal():
+        if ORDERED_LIST_RE.fullmatch(block):
+            return BlockType.ORDERED_LIST
 
     return BlockType.PARAGRAPH
 
@@ -173,6 +341,14 @@ def heading_block_to_html_node(block):
     return ParentNode(f"h{cnt}", children)
 
 def code_block_to_html_node(block):
+    # A single word right after the opening fence names the language
+    info, newline, code = block[3:-3].partition("\n")
+    if newline and FENCE_LANGUAGE_RE.fullmatch(info.strip()):
+        language = info.strip()
+        code = code.strip()
+        highlighted = highlight_code(code, language)
+        return ParentNode("pre", [LeafNode("code", escape_html(code) if highlighted is None else highlighted, {"class": f"language-{language}"})])
+
     text = block[3:-3].strip()
 
     return ParentNode("pre", [text_node_to_html_node(TextNode(text, TextType.CODE))])
@@ -243,11 +419,54 @@ def markdown_to_html_node(markdown):
 
     return ParentNode("div", children)
 
+def iter_blocks_html(blocks):
+    # Same output as markdown_to_html_node(...).iter_html(), one block node alive at a time
+    yield "<div>"
+    empty = True
+    for block in blocks:
+        empty = False
+        yield from block_to_html_node(block, block_to_block_type(block)).iter_html()
+
+    if empty:
+        raise ValueError("children is required!")
+    yield "</div>"
+
 def extract_title(markdown):
-    lines = markdown.split("\n")
+    # Accepts a string or an iterable of lines (e.g. an open file) and stops at the first h1
+    if isinstance(markdown, str):
+        if markdown.startswith("# "):
+            start = 0
+        else:
+            start = markdown.find("\n# ") + 1
+            if start == 0:
+                raise ValueError("No h1 header found in the markdown.")
 
-    for line in lines:
+        end = markdown.find("\n", start)
+        return markdown[start + 2:end if end != -1 else len(markdown)].strip()
+
+    for line in markdown:
         if line.startswith("# "):
             return line[2:].strip()
 
     raise ValueError("No h1 header found in the markdown.")
+
+def extract_summary(markdown):
+    # Plain text of the first prose paragraph; like extract_title it accepts a string
+    # or an iterable of lines and stops reading as soon as the paragraph is found
+    blocks = markdown_to_blocks(markdown) if isinstance(markdown, str) else iter_blocks(markdown)
+    for block in blocks:
+        if block_to_block_type(block) != BlockType.PARAGRAPH:
+            continue
+
+        nodes = text_to_textnodes(" ".join(block.split("\n")))
+        # Paragraphs made only of links and images are navigation, not prose
+        if all(node.text_type in (TextType.LINK, TextType.IMAGE) or not node.text.strip() for node in nodes):
+            continue
+
+        summary = "".join(node.text for node in nodes)
+        if len(summary) > SUMMARY_LENGTH:
+            cut = summary.rfind(" ", 0, SUMMARY_LENGTH)
+            summary = summary[:cut if cut > 0 else SUMMARY_LENGTH].rstrip() + "..."
+        return summary
+
+    return ""
@@ -0,0 +1,158 @@
+import hashlib
+import html
+import json
+import os
+import re
+
+from fileio import save_json
+
+# Bump whenever highlighted output changes for the same code, so stale cache files are dropped
+HIGHLIGHT_VERSION = 1
+# Cached snippets no build used for this many builds that highlighted anything are dropped
+MAX_IDLE_BUILDS = 10
+
+STRINGS = r"\"(?:\\.|[^\"\\\n])*\"|'(?:\\.|[^'\\\n])*'"
+
+
+class Language:
+    def __init__(self, keywords, comment=None, strings=STRINGS):
+        self.keywords = frozenset(keywords.split())
+        # Comments and strings are matched first, so keywords inside them stay plain
+        groups = [f"(?P<s>{strings})", r"(?P<w>[A-Za-z_$][\w$]*)", r"(?P<m>\b\d[\w.]*)"]
+        if comment is not None:
+            groups.insert(0, f"(?P<c>{comment})")
+        self.pattern = re.compile("|".join(groups))
+
+    def highlight(self, code):
+        parts = []
+        last_idx = 0
+        for match in self.pattern.finditer(code):
+            kind = match.lastgroup
+            if kind == "w":
+                if match.group() not in self.keywords:
+                    continue
+                kind = "k"
+            parts.append(html.escape(code[last_idx:match.start()], quote=False))
+            parts.append(f'<span class="{kind}">{html.escape(match.group(), quote=False)}</span>')
+            last_idx = match.end()
+        parts.append(html.escape(code[last_idx:], quote=False))
+        return "".join(parts)
+
+
+C_COMMENT = r"//[^\n]*|/\*[\s\S]*?\*/"
+
+LANGUAGES = {
+    "python": Language(
+        "False None True and as assert async await break class continue def del elif else except finally for"
+        " from global if import in is lambda nonlocal not or pass raise return try while with yield",
+        r"#[^\n]*",
+        r"\"\"\"[\s\S]*?\"\"\"|'''[\s\S]*?'''|" + STRINGS,
+    ),
+    "javascript": Language(
+        "async await break case catch class const continue debugger default delete do else export extends false"
+        " finally for function if import in instanceof let new null return super switch this throw true try"
+        " typeof undefined var void while with yield interface type enum implements",
+        C_COMMENT,
+        r"`(?:\\.|[^`\\])*`|" + STRINGS,
+    ),
+    "bash": Language(
+        "if then else elif fi for while until do done case esac in function return local export readonly"
+        " set unset shift exit source echo cd",
+        r"(?<![\w$])#[^\n]*",
+    ),
+    "json": Language("true false null"),
+    "css": Language("important", r"/\*[\s\S]*?\*/"),
+    "c": Language(
+        "auto break case char class const continue default delete do double else enum extern float for goto if"
+        " inline int long namespace new private protected public return short signed sizeof static struct switch"
+        " template this typedef union unsigned using virtual void volatile while true false nullptr NULL",
+        C_COMMENT,
+    ),
+    "go": Language(
+        "break case chan const continue default defer else fallthrough for func go goto if import interface map"
+        " package range return select struct switch type var true false nil",
+        C_COMMENT,
+        r"`[^`]*`|" + STRINGS,
+    ),
+}
+
+ALIASES = {
+    "py": "python", "js": "javascript", "ts": "javascript", "typescript": "javascript", "jsx": "javascript",
+    "sh": "bash", "shell": "bash", "zsh": "bash", "cpp": "c", "c++": "c", "h": "c", "java": "c", "golang": "go",
+}
+
+
+def canonical_language(name):
+    name = name.lower()
+    return ALIASES.get(name, name)
+
+def language_of(name):
+    return LANGUAGES.get(canonical_language(name))
+
+def highlight(code, language):
+    # HTML with <span class="k|s|c|m"> around keywords, strings, comments and numbers,
+    # or None for languages without built-in support
+    lang = language_of(language)
+    return lang.highlight(code) if lang is not None else None
+
+
+# Highlighted HTML persisted between builds, keyed by canonical language name and
+# a hash of the code, so snippets repeated across pages and builds are highlighted
+# once. Each entry remembers the last build that used it, see MAX_IDLE_BUILDS.
+class HighlightCache:
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        # key -> number of the last build that used the entry
+        self.last_used = {}
+        self.build = 0
+        self.used = set()
+        self.added = {}
+
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                data = json.load(file)
+            if data.get("version") == HIGHLIGHT_VERSION:
+                self.entries = data.get("entries", {})
+                self.last_used = data.get("used", {})
+                self.build = data.get("build", 0)
+
+    def highlight(self, code, language):
+        lang = language_of(language)
+        if lang is None:
+            return None
+
+        key = f"{canonical_language(language)}:{hashlib.sha256(code.encode('utf-8')).hexdigest()}"
+        self.used.add(key)
+        result = self.entries.get(key)
+        if result is None:
+            result = self.entries[key] = self.added[key] = lang.highlight(code)
+        return result
+
+    def take_added(self):
+        # Entries highlighted and keys used since the last call, for worker processes to hand back
+        added, used = self.added, self.used
+        self.added, self.used = {}, set()
+        return added, used
+
+    def merge(self, entries, used=()):
+        for key, value in entries.items():
+            self.entries.setdefault(key, value)
+        self.used.update(entries, used)
+
+    def save(self):
+        # Builds that highlighted nothing leave the file, and the age of its entries, alone
+        if not self.used and os.path.exists(self.path):
+            return
+        self.build += 1
+        for key in self.used:
+            self.last_used[key] = self.build
+        # Entries from before usage was recorded count as used by this build
+        self.last_used = {key: self.last_used.get(key, self.build) for key in self.entries}
+        self.last_used = {key: build for key, build in self.last_used.items() if self.build - build < MAX_IDLE_BUILDS}
+        self.entries = {key: self.entries[key] for key in self.last_used}
+        self.used = set()
+        self.added = {}
+
+        data = {"version": HIGHLIGHT_VERSION, "build": self.build, "entries": self.entries, "used": self.last_used}
+        save_json(self.path, data, compact=True)
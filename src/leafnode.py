@@ -1,7 +1,11 @@
+from types import MappingProxyType
+
 from htmlnode import HTMLNode
 
 
 class LeafNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, value, props = None):
         super().__init__(tag=tag, value=value, children=None, props=props)
 
@@ -16,3 +20,31 @@ class LeafNode(HTMLNode):
             return f"<{self.tag}{self.props_to_html()}></{self.tag}>"
 
         return f"<{self.tag}{self.props_to_html()}>{self.value}</{self.tag}>"
+
+    def iter_html(self):
+        yield self.to_html()
+
+
+class SharedLeafNode(LeafNode):
+    # A leaf handed out to many parents at once, so it can't be mutated: its
+    # attributes are read-only, props is a read-only copy, and its HTML is
+    # rendered once up front
+    __slots__ = ("html",)
+
+    def __init__(self, tag, value, props = None):
+        props = MappingProxyType(dict(props)) if props else None
+        for name, attr in (("tag", tag), ("value", value), ("children", None), ("props", props)):
+            object.__setattr__(self, name, attr)
+        object.__setattr__(self, "html", LeafNode.to_html(self))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is shared and can't be modified")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is shared and can't be modified")
+
+    def to_html(self):
+        return self.html
+
+    def iter_html(self):
+        yield self.html
@@ -1,8 +1,51 @@
+import argparse
+import contextlib
+import cProfile
+import errno
 import os
 import shutil
 import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
 
-from helper import extract_title, markdown_to_html_node
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+import helper
+from assets import AssetStore
+from cache import RenderCache, iter_chunks
+from feeds import BLOG_DIR, write_site_indexes
+from fileio import read_chunks
+from frontmatter import is_draft, load_front_matter, read_front_matter
+from graph import DependencyGraph, PageLinks
+from highlight import HighlightCache
+from helper import extract_summary, extract_title, iter_blocks, iter_blocks_html
+from manifest import Manifest, hash_file
+from optimize import Precompressor, minify_copy
+from pipeline import generate_pages_async
+from search import PageTerms, SearchIndex
+from stats import BuildStats, NullStats
+from template import TemplateRegistry, load_template
+
+FICLONE = 0x40049409
+
+VERBOSE = True
+
+def set_verbose(verbose):
+    global VERBOSE
+    VERBOSE = verbose
+
+def init_worker(verbose, assets, highlights):
+    set_verbose(verbose)
+    helper.set_image_assets(assets)
+    helper.set_highlight_cache(highlights)
+
+def log(message):
+    if VERBOSE:
+        print(message)
 
 def clean_dir(path):
     for filename in os.listdir(path):
@@ -10,84 +53,442 @@ def clean_dir(path):
         try:
             if os.path.isfile(file_path) or os.path.islink(file_path):
                 os.unlink(file_path)
-                print(f"Removed file: {file_path}")
+                log(f"Removed file: {file_path}")
             elif os.path.isdir(file_path):
                 shutil.rmtree(file_path)
-                print(f"Removed directory: {file_path}")
+                log(f"Removed directory: {file_path}")
         except Exception as e:
             print(f"Failed to delete {file_path}. Reason: {e}")
 
-def copy_dir(src_path, dest_path):
+def is_synced(src_path, dest_path, checksum=False):
+    try:
+        src_stat = os.stat(src_path)
+        dest_stat = os.stat(dest_path)
+    except FileNotFoundError:
+        return False
+
+    if os.path.samestat(src_stat, dest_stat):
+        return True
+
+    if src_stat.st_size != dest_stat.st_size:
+        return False
+
+    if checksum:
+        return hash_file(src_path) == hash_file(dest_path)
+
+    return src_stat.st_mtime_ns == dest_stat.st_mtime_ns
+
+def reflink(src_path, dest_path):
+    # Copy-on-write clone (btrfs, XFS); raises OSError where unsupported
+    if fcntl is None or not sys.platform.startswith("linux"):
+        raise OSError(errno.EOPNOTSUPP, "reflinks are not supported on this platform")
+
+    with open(src_path, "rb") as src, open(dest_path, "wb") as dest:
+        try:
+            fcntl.ioctl(dest.fileno(), FICLONE, src.fileno())
+        except OSError:
+            dest.close()
+            os.unlink(dest_path)
+            raise
+    shutil.copystat(src_path, dest_path)
+
+def copy_file(src_path, dest_path, manifest=None, link=False, checksum=False, minify=False):
+    if minify and dest_path.endswith(".css"):
+        changed = minify_copy(src_path, dest_path, manifest)
+        if changed:
+            log(f"Minified file: {src_path} to {dest_path}")
+        return changed
+
+    if is_synced(src_path, dest_path, checksum):
+        if manifest is not None:
+            manifest.record(dest_path, {"source": src_path})
+        return False
+
+    # Never write through an existing destination: it may be a hardlink to an older source
+    if os.path.lexists(dest_path):
+        os.unlink(dest_path)
+
+    action = "Copied"
+    if link:
+        try:
+            reflink(src_path, dest_path)
+            action = "Reflinked"
+        except OSError:
+            try:
+                os.link(src_path, dest_path)
+                action = "Hardlinked"
+            except OSError:
+                shutil.copy2(src_path, dest_path)
+    else:
+        shutil.copy2(src_path, dest_path)
+    log(f"{action} file: {src_path} to {dest_path}")
+
+    if manifest is not None:
+        manifest.record(dest_path, {"source": src_path})
+    return True
+
+def copy_dir(src_path, dest_path, manifest=None, link=False, checksum=False, assets=None, url="/", minify=False):
     os.makedirs(dest_path, exist_ok=True)
     for item in os.listdir(src_path):
         s = os.path.join(src_path, item)
         d = os.path.join(dest_path, item)
         try:
             if os.path.isfile(s):
-                shutil.copy2(s, d)
-                print(f"Copied file: {s} to {d}")
+                # Fingerprinted images are only published under their fingerprinted name
+                if assets and url + item in assets:
+                    d = os.path.join(dest_path, os.path.basename(assets[url + item]["url"]))
+                copy_file(s, d, manifest, link, checksum, minify)
             elif os.path.isdir(s):
-                copy_dir(s, d)
+                copy_dir(s, d, manifest, link, checksum, assets, f"{url}{item}/", minify)
         except Exception as e:
             print(f"Failed to copy {s} to {d}. Reason: {e}")
 
-def generate_page(from_path, template_path, dest_path, basepath):
-    print(f"Generating page from {from_path} to {dest_path} using {template_path}")
+def tee(fragments, sink):
+    for fragment in fragments:
+        sink.write(fragment)
+        yield fragment
+
+def generate_page(from_path, template, dest_path, basepath, stats=None, cache=None, index=False, parse=False):
+    stats = stats or NullStats()
+    start = time.perf_counter()
 
-    with open(from_path, encoding='utf-8') as file:
-        markdown = file.read()
+    if isinstance(template, str):
+        with stats.phase("template"):
+            template = load_template(template, basepath, helper.IMAGE_ASSETS)
 
-    with open(template_path, encoding='utf-8') as file:
-        template = file.read()
+    log(f"Generating page from {from_path} to {dest_path}")
 
-    title = extract_title(markdown)
-    html_string = markdown_to_html_node(markdown).to_html()
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(helper.use_basepath(basepath))
+        with stats.phase("read"):
+            key = cache.key(read_chunks(from_path), helper.RENDER_KEY) if cache is not None else None
+            # Indexing and link collection need the TextNodes, so a cached body is no use then
+            entry = cache.open(key) if cache is not None and not (index or parse) else None
 
-    output = template.replace("{{ Title }}", title).replace("{{ Content }}", html_string)
+        file = stack.enter_context(open(from_path, encoding='utf-8'))
+        with stats.phase("read"):
+            meta = read_front_matter(file)
 
-    output = output.replace('href="/', f'href="{basepath}').replace('src="/', f'src="{basepath}')
+        if entry is not None:
+            stats.count("render_cache_hit")
+            title, summary, body = entry
+            stack.callback(body.close)
+            fragments = iter_chunks(body)
+        else:
+            # The markdown is streamed block by block, so memory is bounded by the largest block
+            with stats.phase("read"):
+                body_start = file.tell()
+                title = str(meta["title"]) if "title" in meta else extract_title(file)
+                file.seek(body_start)
+                summary = str(meta["summary"]) if "summary" in meta else extract_summary(file)
+                file.seek(body_start)
 
-    with open(dest_path, 'w', encoding='utf-8') as file:
-        file.write(output)
+            for name in ("block_to_block_type", "block_to_html_node"):
+                stack.enter_context(stats.instrument(helper, name, "parse"))
+            stack.enter_context(stats.instrument(helper, "text_to_textnodes", "inline"))
+            terms = stack.enter_context(PageTerms().collect()) if index else None
+            links = stack.enter_context(PageLinks().collect())
 
-def generate_pages_recursive(dir_path_content, template_path, dest_dir_path, basepath):
-    os.makedirs(dest_dir_path, exist_ok=True)
-    for item in os.listdir(dir_path_content):
+            fragments = iter_blocks_html(stats.timed_iter(iter_blocks(file), "read"))
+            if cache is not None:
+                stats.count("render_cache_miss")
+                fragments = tee(fragments, stack.enter_context(cache.writer(key, title, summary)))
+
+        # Stream into a temporary file so a failed render never leaves a truncated page behind
+        tmp_path = f"{dest_path}.tmp"
+        try:
+            with stats.phase("write"):
+                with open(tmp_path, 'w', encoding='utf-8') as file:
+                    template.write(file, Title=helper.escape_html(title), Content=stats.timed_iter(fragments, "serialize"))
+                # A layout without {{ Content }} leaves the body unread; it's still rendered
+                # in full so the cache entry tee-ing it is never saved truncated
+                for _ in fragments:
+                    pass
+                os.replace(tmp_path, dest_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    stats.record_page(from_path, time.perf_counter() - start)
+    if entry is None:
+        hits, misses = helper.take_leaf_counts()
+        if hits or misses:
+            stats.count("shared_leaf_hit", hits)
+            stats.count("shared_leaf_miss", misses)
+    metadata = {"title": title, "summary": summary, "meta": meta}
+    if entry is None:
+        metadata.update(links=links.links, images=links.images)
+    if index:
+        metadata["terms"] = terms.terms
+    return metadata
+
+def collect_pages(dir_path_content, dest_dir_path, makedirs=True, drafts=False):
+    pages = []
+    if makedirs:
+        os.makedirs(dest_dir_path, exist_ok=True)
+    for item in sorted(os.listdir(dir_path_content)):
         s = os.path.join(dir_path_content, item)
 
         # Change .md to .html for the destination file
         if os.path.isfile(s) and s.endswith(".md"):
+            # Only the front matter is read, so drafts cost no parsing at all
+            if not drafts and is_draft(s):
+                continue
             filename = os.path.splitext(item)[0] + ".html"
-            d = os.path.join(dest_dir_path, filename)
-            try:
-                generate_page(s, template_path, d, basepath)
-                print(f"Generated {d} from {s}")
-            except Exception as e:
-                print(f"Failed to generate {s} to {d}. Reason: {e}")
+            pages.append((s, os.path.join(dest_dir_path, filename)))
 
         elif os.path.isdir(s):
-            d = os.path.join(dest_dir_path, item)
-            generate_pages_recursive(s, template_path, d, basepath)
+            pages.extend(collect_pages(s, os.path.join(dest_dir_path, item), makedirs, drafts))
 
-def main():
-    basepath = "/" if len(sys.argv) < 2 else sys.argv[1]
+    return pages
 
-    output_dir = "./docs"
-    static_path = "./static"
+# One page for generate_page_job; picklable, so it can be handed to worker processes
+PageJob = namedtuple("PageJob", "source template dest basepath cache profile index parse")
+
+def generate_page_job(job):
+    stats = BuildStats() if job.profile else None
+    try:
+        metadata = generate_page(job.source, job.template, job.dest, job.basepath, stats, job.cache, job.index, job.parse)
+        log(f"Generated {job.dest} from {job.source}")
+        # Worker processes hand new and used highlights back so the parent persists and keeps them
+        if helper.HIGHLIGHTS is not None and helper.HIGHLIGHTS.used:
+            metadata["highlights"] = helper.HIGHLIGHTS.take_added()
+    except Exception as e:
+        return f"{type(e).__name__}: {e}", stats, None
+
+    return None, stats, metadata
+
+def generate_pages(pages, template_path, basepath, manifest=None, jobs=1, registry=None, stats=None, cache=None, io_workers=0, io_queue=32, search=None):
+    if registry is None:
+        registry = TemplateRegistry(template_path, None, None, basepath, helper.IMAGE_ASSETS)
+    pending = []
+    entries = {}
+    failures = []
+    for s, d in pages:
+        try:
+            with (stats or NullStats()).phase("read"):
+                meta = load_front_matter(s)
+            # Layouts are picked by directory or front matter; each is compiled once
+            with (stats or NullStats()).phase("template"):
+                layout = registry.select(s, meta)
+                template = registry.get(layout)
+            if manifest is not None:
+                entries[d] = {
+                    "source": s,
+                    "hash": manifest.file_hash(s),
+                    "template": registry.digest(layout),
+                    "templates": registry.files(layout),
+                    "basepath": basepath,
+                    "assets": helper.IMAGE_ASSETS_KEY,
+                    "minify": registry.minify,
+                    # Upgrades that change the HTML for the same inputs rebuild every page
+                    "parser": helper.PARSER_VERSION,
+                    "highlight": helper.HIGHLIGHT_VERSION,
+                }
+        except (OSError, ValueError) as e:
+            failures.append((s, d, f"{type(e).__name__}: {e}"))
+            if manifest is not None:
+                manifest.discard(d)
+            continue
+
+        if manifest is not None:
+
+            # Entries recorded before page metadata existed are rebuilt once to collect it
+            fresh = manifest.is_fresh(d, entries[d]) and "meta" in manifest.get(d)
+            if fresh and (search is None or search.is_fresh(d, entries[d]["hash"])):
+                continue
+
+        index = search is not None and not search.is_fresh(d, entries.get(d, {}).get("hash"))
+        # A cached body carries no links, so they come from the last render of the same source
+        recorded = manifest.get(d) if manifest is not None else None
+        parse = manifest is not None and not (recorded and recorded.get("hash") == entries[d]["hash"] and "links" in recorded)
+        pending.append(PageJob(s, template, d, basepath, cache, stats is not None, index, parse))
+
+    if io_workers > 0 and jobs <= 1:
+        errors, metadata = generate_pages_async(
+            [(job.source, job.dest) for job in pending],
+            {job.source: job.template for job in pending},
+            basepath,
+            cache=cache,
+            stats=stats,
+            concurrency=io_workers,
+            queue_size=io_queue,
+            index={job.source for job in pending if job.index},
+            parse={job.source for job in pending if job.parse},
+        )
+        results = [(error, None, page) for error, page in zip(errors, metadata)]
+        for job, error in zip(pending, errors):
+            if error is None:
+                log(f"Generated {job.dest} from {job.source}")
+    elif jobs > 1 and len(pending) > 1:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(VERBOSE, helper.IMAGE_ASSETS, helper.HIGHLIGHTS)) as executor:
+            results = list(executor.map(generate_page_job, pending, chunksize=max(1, len(pending) // (jobs * 4))))
+    else:
+        results = list(map(generate_page_job, pending))
+
+    for job, (error, page_stats, metadata) in zip(pending, results):
+        s, d = job.source, job.dest
+        if page_stats is not None:
+            stats.merge(page_stats)
+
+        if error is not None:
+            failures.append((s, d, error))
+        else:
+            if "highlights" in metadata:
+                helper.HIGHLIGHTS.merge(*metadata.pop("highlights"))
+            if "terms" in metadata:
+                search.record(d, entries.get(d, {}).get("hash"), metadata.pop("terms"))
+
+        if manifest is not None:
+            if error is None:
+                # Pages skipped next time still contribute to the sitemap, feed, listings and dependency graph
+                if "links" not in metadata:
+                    recorded = manifest.get(d)
+                    metadata.update(links=recorded["links"], images=recorded["images"])
+                manifest.record(d, {**entries[d], **metadata, "mtime": os.path.getmtime(s)})
+            else:
+                manifest.discard(d)
+
+    failures.sort()
+    print(f"Pages: {len(pending) - len(failures)} generated, {len(pages) - len(pending)} up to date, {len(failures)} failed")
+    for s, d, error in failures:
+        print(f"Failed to generate {s} to {d}. Reason: {error}")
+
+    return failures
+
+def generate_pages_recursive(dir_path_content, template_path, dest_dir_path, basepath, manifest=None, jobs=1, stats=None, cache=None, io_workers=0, io_queue=32):
+    pages = collect_pages(dir_path_content, dest_dir_path)
+    return generate_pages(pages, template_path, basepath, manifest=manifest, jobs=jobs, stats=stats, cache=cache, io_workers=io_workers, io_queue=io_queue)
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Build the static site into ./docs")
+    parser.add_argument("basepath", nargs="?", default="/", help="base path the site is served from")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="number of worker processes for page generation (0 = all cores)")
+    parser.add_argument("--io-workers", type=int, default=0, help="overlap reads, rendering and writes using this many I/O threads (ignored with --jobs)")
+    parser.add_argument("--io-queue", type=int, default=32, help="pages buffered between pipeline stages with --io-workers")
+    parser.add_argument("--link", action="store_true", help="reflink or hardlink static files instead of copying them when possible")
+    parser.add_argument("--checksum", action="store_true", help="compare static files by content hash instead of size and mtime")
+    parser.add_argument("--no-cache", action="store_true", help="always parse markdown and highlight code instead of reusing cached page bodies and highlights")
+    parser.add_argument("--cache-size", type=int, default=512, help="size bound of the render cache in MB")
+    parser.add_argument("--site-url", help="scheme and host the site is published at; sitemap.xml and the feed are only written with it")
+    parser.add_argument("--posts-per-page", type=int, default=10, help="posts per generated blog listing page")
+    parser.add_argument("--fingerprint", action="store_true", help="publish images under content-hashed names and add PNG width/height to <img> tags")
+    parser.add_argument("--minify", action="store_true", help="minify the HTML template and CSS files")
+    parser.add_argument("--precompress", action="store_true", help="write .gz (and .br when brotli is installed) next to every text output")
+    parser.add_argument("--search", action="store_true", help="emit a prefix-sharded search index into docs/search/")
+    parser.add_argument("--layouts", default="./layouts", help="directory of per-section layouts and partials/")
+    parser.add_argument("--drafts", action="store_true", help="also build pages marked `draft: true` in their front matter")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only print the summary, not every file")
+    parser.add_argument("--profile", nargs="?", const="table", choices=["table", "json"], help="report per-phase and per-page timings")
+    parser.add_argument("--top", type=int, default=10, help="number of slowest pages in the --profile report")
+    parser.add_argument("--cprofile", metavar="PATH", help="dump cProfile stats of the build process to PATH")
+    return parser.parse_args(argv)
+
+def build(basepath="/", jobs=1, output_dir="./docs", static_path="./static", content_path="./content", template_path="./template.html", manifest=None, link=False, checksum=False, stats=None, cache=None, io_workers=0, io_queue=32, site_url=None, posts_per_page=10, search=None, asset_store=None, minify=False, precompressor=None, drafts=False, layouts_path="./layouts", highlights=None):
+    if manifest is None:
+        manifest = Manifest("./.build/manifest.json", output_dir)
+    phase = (stats or NullStats()).phase
 
     os.makedirs(output_dir, exist_ok=True)
-    clean_dir(output_dir)
+
+    # Without a manifest we can't tell our outputs apart from leftovers
+    if not manifest.loaded:
+        with phase("clean"):
+            clean_dir(output_dir)
+
+    with phase("static"):
+        assets = asset_store.collect(static_path) if asset_store is not None else None
+        helper.set_image_assets(assets)
+    helper.set_highlight_cache(highlights)
 
     if os.path.exists(static_path):
-        copy_dir(static_path, output_dir)
+        with phase("static"):
+            copy_dir(static_path, output_dir, manifest, link, checksum, assets, minify=minify)
     else:
         print(f"Source path '{static_path}' does not exist. Nothing to copy.")
 
-    content_path = "./content"
-    template_path = "./template.html"
-    dest_path = output_dir
+    pages = collect_pages(content_path, output_dir, drafts=drafts)
+    with phase("template"):
+        registry = TemplateRegistry(template_path, layouts_path, content_path, basepath, helper.IMAGE_ASSETS, minify)
+        registry.get()
+    failures = generate_pages(
+        pages,
+        template_path,
+        basepath,
+        manifest=manifest,
+        jobs=jobs,
+        registry=registry,
+        stats=stats,
+        cache=cache,
+        io_workers=io_workers,
+        io_queue=io_queue,
+        search=search,
+    )
+
+    with phase("feeds"):
+        template = registry.get(registry.select(os.path.join(content_path, BLOG_DIR, "index.md")))
+        for path in write_site_indexes(pages, manifest, output_dir, template, basepath, site_url, posts_per_page):
+            log(f"Generated {path}")
+
+    if search is not None:
+        with phase("search"):
+            for path in search.write(pages, output_dir, manifest):
+                log(f"Generated {path}")
+            search.save()
+
+    if precompressor is not None:
+        with phase("compress"):
+            for path in precompressor.run(manifest, jobs):
+                log(f"Compressed {path}")
+            precompressor.save()
+
+    for path in manifest.remove_orphans(output_dir):
+        log(f"Removed orphaned output: {path}")
+
+    with phase("graph"):
+        graph = DependencyGraph(os.path.join(os.path.dirname(manifest.path), "graph.json"))
+        graph.update(pages, manifest, output_dir, static_path, template_path)
+        graph.save()
+    broken = graph.broken_links()
+    for source, url in broken:
+        print(f"Broken link in {source}: {url}")
+    if broken:
+        print(f"Broken links: {len(broken)}")
+
+    manifest.save()
+    if asset_store is not None:
+        asset_store.save()
+    if highlights is not None:
+        highlights.save()
+    if cache is not None:
+        cache.evict()
+    return failures
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    set_verbose(not args.quiet)
+    stats = BuildStats() if args.profile else None
+    profiler = cProfile.Profile() if args.cprofile else None
+
+    if profiler:
+        profiler.enable()
+    cache = None if args.no_cache else RenderCache("./.build/render-cache", args.cache_size * 1024 * 1024)
+    search = SearchIndex("./.build/search.json") if args.search else None
+    asset_store = AssetStore("./.build/assets.json") if args.fingerprint else None
+    precompressor = Precompressor("./.build/precompressed.json") if args.precompress else None
+    highlights = None if args.no_cache else HighlightCache("./.build/highlight.json")
+    failures = build(args.basepath, args.jobs or os.cpu_count() or 1, link=args.link, checksum=args.checksum, stats=stats, cache=cache, io_workers=args.io_workers, io_queue=args.io_queue, site_url=args.site_url, posts_per_page=args.posts_per_page, search=search, asset_store=asset_store, minify=args.minify, precompressor=precompressor, drafts=args.drafts, layouts_path=args.layouts, highlights=highlights)
+    if profiler:
+        profiler.disable()
+        profiler.dump_stats(args.cprofile)
+
+    if stats:
+        stats.finish()
+        print(stats.to_json(args.top) if args.profile == "json" else stats.format_table(args.top))
 
-    generate_pages_recursive(content_path, template_path, dest_path, basepath)
+    if failures:
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
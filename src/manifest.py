@@ -0,0 +1,105 @@
+import hashlib
+import json
+import os
+
+from fileio import read_chunks, save_json
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    for chunk in read_chunks(path):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+def is_within(path, root):
+    path, root = os.path.abspath(path), os.path.abspath(root)
+    return os.path.commonpath([path, root]) == root
+
+
+# Outputs of one build keyed by path. With `output_dir` given, a manifest saved
+# for another output directory is ignored, so its outputs are never taken for ours.
+class Manifest:
+    def __init__(self, path, output_dir=None):
+        self.path = path
+        self.output_dir = os.path.abspath(output_dir) if output_dir is not None else None
+        self.entries = {}
+        self.seen = set()
+        self.hashes = {}
+        self.loaded = False
+
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                data = json.load(file)
+            if self.output_dir is None or data.get("output_dir", self.output_dir) == self.output_dir:
+                self.entries = data.get("outputs", {})
+                self.loaded = True
+
+    def file_hash(self, path):
+        if path not in self.hashes:
+            self.hashes[path] = hash_file(path)
+        return self.hashes[path]
+
+    def is_fresh(self, dest, entry):
+        # Only the inputs in `entry` are compared; recorded entries may also carry
+        # metadata about the output (e.g. a page title) that later passes reuse
+        dest = os.path.normpath(dest)
+        self.seen.add(dest)
+        recorded = self.entries.get(dest)
+        if recorded is None or any(recorded.get(name) != value for name, value in entry.items()):
+            return False
+        return os.path.exists(dest)
+
+    def get(self, dest):
+        return self.entries.get(os.path.normpath(dest))
+
+    def record(self, dest, entry):
+        dest = os.path.normpath(dest)
+        self.seen.add(dest)
+        self.entries[dest] = entry
+
+    def discard(self, dest):
+        # Forgets what the output was built from, so it's rebuilt next time, but keeps it
+        # tracked by source: an output left over from an earlier build is still removed
+        # as an orphan once its source goes away
+        dest = os.path.normpath(dest)
+        self.seen.add(dest)
+        recorded = self.entries.pop(dest, None)
+        if recorded is not None and "source" in recorded:
+            self.entries[dest] = {"source": recorded["source"]}
+
+    def invalidate(self, path=None):
+        if path is None:
+            self.hashes.clear()
+        else:
+            self.hashes.pop(path, None)
+
+    def remove(self, dest, root):
+        # Only files under root are deleted, and empty parents only up to root
+        dest = os.path.normpath(dest)
+        if not is_within(dest, root):
+            return False
+        self.entries.pop(dest, None)
+        self.seen.discard(dest)
+        if not os.path.isfile(dest):
+            return False
+
+        os.unlink(dest)
+        root = os.path.abspath(root)
+        parent = os.path.dirname(os.path.abspath(dest))
+        while parent != root and is_within(parent, root) and os.path.isdir(parent) and not os.listdir(parent):
+            os.rmdir(parent)
+            parent = os.path.dirname(parent)
+        return True
+
+    def remove_orphans(self, root):
+        removed = []
+        for dest in sorted(set(self.entries) - self.seen):
+            if is_within(dest, root) and self.remove(dest, root):
+                removed.append(dest)
+        return removed
+
+    def save(self):
+        data = {"outputs": self.entries}
+        if self.output_dir is not None:
+            data["output_dir"] = self.output_dir
+        save_json(self.path, data)
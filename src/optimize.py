@@ -0,0 +1,154 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from fileio import save_json
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = {".html", ".css", ".js", ".xml", ".json", ".svg", ".txt"}
+
+PRESERVE_RE = re.compile(r"<(pre|textarea|script|style)\b.*?</\1\s*>", re.S | re.I)
+COMMENT_RE = re.compile(r"<!--(?!\[if).*?-->", re.S)
+SPACE_RE = re.compile(r"\s+")
+BLOCK_TAG_RE = re.compile(
+    r"\s*(</?(?:!doctype|html|head|body|meta|link|title|base|div|p|ul|ol|li|h[1-6]|article|section"
+    r"|nav|header|footer|main|aside|blockquote|pre|table|thead|tbody|tr|td|th|hr|br)\b[^>]*>)\s*",
+    re.I,
+)
+
+CSS_STRING_RE = re.compile(r"\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*'")
+CSS_COMMENT_RE = re.compile(r"/\*.*?\*/", re.S)
+CSS_PUNCTUATION_RE = re.compile(r"\s*([{};,>])\s*")
+
+
+def minify_html(html):
+    # Whitespace is collapsed everywhere and dropped around block-level tags, where it
+    # never renders; <pre>, <textarea>, <script> and <style> are kept verbatim
+    parts = []
+    last_idx = 0
+    for match in PRESERVE_RE.finditer(html):
+        parts.append(minify_html_text(html[last_idx:match.start()]))
+        parts.append(match.group(0))
+        last_idx = match.end()
+    parts.append(minify_html_text(html[last_idx:]))
+    return "".join(parts)
+
+def minify_html_text(html):
+    html = COMMENT_RE.sub("", html)
+    html = SPACE_RE.sub(" ", html)
+    return BLOCK_TAG_RE.sub(r"\1", html)
+
+def minify_css(css):
+    parts = []
+    last_idx = 0
+    for match in CSS_STRING_RE.finditer(css):
+        parts.append(minify_css_code(css[last_idx:match.start()]))
+        parts.append(match.group(0))
+        last_idx = match.end()
+    parts.append(minify_css_code(css[last_idx:]))
+    return "".join(parts).strip()
+
+def minify_css_code(css):
+    css = CSS_COMMENT_RE.sub("", css)
+    css = SPACE_RE.sub(" ", css)
+    css = CSS_PUNCTUATION_RE.sub(r"\1", css)
+    return css.replace(": ", ":").replace(";}", "}")
+
+def minify_copy(src_path, dest_path, manifest=None):
+    # The entry remembers which source stat the minified copy came from, since
+    # size and mtime of the copy no longer match the source
+    stat = os.stat(src_path)
+    entry = {"source": src_path, "minified": [stat.st_size, stat.st_mtime_ns]}
+    if manifest is not None and manifest.is_fresh(dest_path, entry):
+        return False
+
+    with open(src_path, encoding="utf-8") as file:
+        css = minify_css(file.read())
+    # Replace rather than write through: the destination may be a hardlink to the source
+    tmp_path = f"{dest_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        file.write(css)
+    os.replace(tmp_path, dest_path)
+
+    if manifest is not None:
+        manifest.record(dest_path, entry)
+    return True
+
+def sibling_paths(path):
+    return [f"{path}.gz"] + ([f"{path}.br"] if brotli is not None else [])
+
+def compress_job(job):
+    path, known_hash = job
+    with open(path, "rb") as file:
+        data = file.read()
+    digest = hashlib.sha256(data).hexdigest()
+    if digest == known_hash and all(os.path.exists(sibling) for sibling in sibling_paths(path)):
+        return digest, False
+
+    # mtime=0 keeps the .gz byte-identical across builds
+    outputs = {f"{path}.gz": gzip.compress(data, 9, mtime=0)}
+    if brotli is not None:
+        outputs[f"{path}.br"] = brotli.compress(data, quality=11)
+    for sibling, compressed in outputs.items():
+        tmp_path = f"{sibling}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(compressed)
+        os.replace(tmp_path, sibling)
+    return digest, True
+
+
+# Precompressed .gz (and .br when brotli is importable) siblings of text outputs.
+# An output untouched since it was last compressed is skipped by stat; one that was
+# rewritten with the same content is skipped by hash.
+class Precompressor:
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                self.entries = json.load(file).get("outputs", {})
+
+    def run(self, manifest, jobs=1):
+        # Only outputs produced by this build are considered; leftovers are about to be removed as orphans
+        pending = []
+        entries = {}
+        for path in sorted(manifest.seen):
+            if os.path.splitext(path)[1] not in COMPRESSIBLE or not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            entry = self.entries.get(path)
+            stamp = [stat.st_size, stat.st_mtime_ns]
+            if entry is not None and entry["stat"] == stamp and all(os.path.exists(sibling) for sibling in sibling_paths(path)):
+                entries[path] = entry
+            else:
+                pending.append((path, entry["hash"] if entry is not None else None))
+
+        if jobs > 1 and len(pending) > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                results = list(executor.map(compress_job, pending, chunksize=max(1, len(pending) // (jobs * 4))))
+        else:
+            results = list(map(compress_job, pending))
+
+        compressed = []
+        for (path, _), (digest, written) in zip(pending, results):
+            stat = os.stat(path)
+            entries[path] = {"stat": [stat.st_size, stat.st_mtime_ns], "hash": digest}
+            if written:
+                compressed.append(path)
+
+        self.entries = entries
+        for path in entries:
+            for sibling in sibling_paths(path):
+                manifest.record(sibling, {"source": path})
+        return compressed
+
+    def save(self):
+        save_json(self.path, {"outputs": self.entries})
@@ -2,14 +2,19 @@ from htmlnode import HTMLNode
 
 
 class ParentNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, children, props = None):
         super().__init__(tag=tag, value=None, children=children, props=props)
 
-    def to_html(self):
+    def iter_html(self):
         if not self.tag:
             raise ValueError("tag is required!")
 
         if not self.children:
             raise ValueError("children is required!")
 
-        return f"<{self.tag}{self.props_to_html()}>{''.join(map(lambda x: x.to_html(), self.children))}</{self.tag}>"
+        yield f"<{self.tag}{self.props_to_html()}>"
+        for child in self.children:
+            yield from child.iter_html()
+        yield f"</{self.tag}>"
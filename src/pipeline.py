@@ -0,0 +1,164 @@
+import asyncio
+import contextlib
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import helper
+from fileio import decode_text
+from helper import extract_summary, extract_title, markdown_to_html_node
+from frontmatter import read_front_matter, split_front_matter
+from graph import PageLinks
+from search import PageTerms
+from stats import NullStats
+
+
+def read_source(path):
+    with open(path, "rb") as file:
+        return file.read()
+
+def write_output(path, text):
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+def render_body(data, index=False):
+    # Returns the page metadata collected while rendering alongside the body
+    meta, markdown = split_front_matter(decode_text(data))
+    title = str(meta["title"]) if "title" in meta else extract_title(markdown)
+    summary = str(meta["summary"]) if "summary" in meta else extract_summary(markdown)
+    with PageLinks().collect() as links:
+        if not index:
+            body = markdown_to_html_node(markdown).to_html()
+            return title, summary, body, {"meta": meta, "links": links.links, "images": links.images}
+
+        with PageTerms().collect() as terms:
+            body = markdown_to_html_node(markdown).to_html()
+    return title, summary, body, {"meta": meta, "links": links.links, "images": links.images, "terms": terms.terms}
+
+def read_meta(data):
+    # Front matter isn't part of a cache entry; only the head of the source is decoded for it
+    return read_front_matter(io.TextIOWrapper(io.BytesIO(data), encoding="utf-8"))
+
+def format_error(e):
+    return f"{type(e).__name__}: {e}"
+
+
+async def run_pipeline(pages, template, basepath, cache=None, stats=None, concurrency=8, queue_size=32, index=frozenset(), parse=frozenset()):
+    # Reads and writes run on `concurrency` I/O threads while a single render thread
+    # parses; the bounded queues between the stages provide backpressure. `template`
+    # is either used for every page or a dict of templates by source path
+    loop = asyncio.get_running_loop()
+    profile = stats or NullStats()
+    errors = [None] * len(pages)
+    metadata = [None] * len(pages)
+    # Time spent reading, rendering and writing each page, without its queue waits
+    elapsed = [0.0] * len(pages)
+    sources = asyncio.Queue()
+    rendering = asyncio.Queue(queue_size)
+    writing = asyncio.Queue(queue_size)
+    for i in range(len(pages)):
+        sources.put_nowait(i)
+
+    io_pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="ssg-io")
+    render_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ssg-render")
+
+    def load(i):
+        start = time.perf_counter()
+        data = read_source(pages[i][0])
+        key = cache.key([data], helper.RENDER_KEY) if cache is not None else None
+        # Pages whose terms or links are needed bypass the cache to be parsed
+        cached = cache.get(key) if cache is not None and pages[i][0] not in index and pages[i][0] not in parse else None
+        elapsed[i] += time.perf_counter() - start
+        return data, key, cached
+
+    def render(i, data):
+        # Only the render thread parses, so its phases never overlap; what the parse and
+        # inline phases don't claim is serialization
+        start = time.perf_counter()
+        with profile.phase("serialize"):
+            result = render_body(data, pages[i][0] in index)
+        elapsed[i] += time.perf_counter() - start
+        return result
+
+    def store(i, html, key, title, summary, body):
+        start = time.perf_counter()
+        write_output(pages[i][1], html)
+        if key is not None and body is not None:
+            cache.put(key, title, body, summary)
+        elapsed[i] += time.perf_counter() - start
+
+    async def reader():
+        while not sources.empty():
+            i = sources.get_nowait()
+            try:
+                item = await loop.run_in_executor(io_pool, load, i)
+            except Exception as e:
+                errors[i] = format_error(e)
+                continue
+            await rendering.put((i, *item))
+
+    async def renderer():
+        while (item := await rendering.get()) is not None:
+            i, data, key, cached = item
+            try:
+                if cached is not None:
+                    title, summary, body = cached
+                    collected = {"meta": read_meta(data)}
+                    if stats is not None:
+                        stats.count("render_cache_hit")
+                else:
+                    title, summary, body, collected = await loop.run_in_executor(render_pool, render, i, data)
+                    hits, misses = helper.take_leaf_counts()
+                    if stats is not None and (hits or misses):
+                        stats.count("shared_leaf_hit", hits)
+                        stats.count("shared_leaf_miss", misses)
+                    if stats is not None and cache is not None:
+                        stats.count("render_cache_miss")
+                layout = template[pages[i][0]] if isinstance(template, dict) else template
+                html = layout.render(Title=helper.escape_html(title), Content=body)
+            except Exception as e:
+                errors[i] = format_error(e)
+                continue
+            await writing.put((i, html, key, title, summary, None if cached is not None else body, collected))
+
+    async def writer():
+        while (item := await writing.get()) is not None:
+            i, html, key, title, summary, body, collected = item
+            try:
+                await loop.run_in_executor(io_pool, store, i, html, key, title, summary, body)
+            except Exception as e:
+                errors[i] = format_error(e)
+                continue
+            metadata[i] = {"title": title, "summary": summary, **collected}
+            if stats is not None:
+                stats.record_page(pages[i][0], elapsed[i])
+
+    with helper.use_basepath(basepath), contextlib.ExitStack() as stack:
+        for name in ("block_to_block_type", "block_to_html_node"):
+            stack.enter_context(profile.instrument(helper, name, "parse"))
+        stack.enter_context(profile.instrument(helper, "text_to_textnodes", "inline"))
+        try:
+            writers = [asyncio.create_task(writer()) for _ in range(concurrency)]
+            render_task = asyncio.create_task(renderer())
+            await asyncio.gather(*(reader() for _ in range(concurrency)))
+            await rendering.put(None)
+            await render_task
+            for _ in writers:
+                await writing.put(None)
+            await asyncio.gather(*writers)
+        finally:
+            io_pool.shutdown()
+            render_pool.shutdown()
+
+    return errors, metadata
+
+def generate_pages_async(pages, template, basepath, cache=None, stats=None, concurrency=8, queue_size=32, index=frozenset(), parse=frozenset()):
+    return asyncio.run(run_pipeline(pages, template, basepath, cache, stats, concurrency, queue_size, index, parse))
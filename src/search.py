@@ -0,0 +1,103 @@
+import contextlib
+import json
+import os
+import re
+
+from feeds import page_url, write_if_changed
+from fileio import save_json
+from helper import observe_textnodes
+
+TERM_RE = re.compile(r"[^\W_]+")
+PREFIX_LENGTH = 2
+
+
+class PageTerms:
+    def __init__(self):
+        self.terms = {}
+        self.position = 0
+
+    def add(self, text_nodes):
+        for node in text_nodes:
+            for match in TERM_RE.finditer(node.text.lower()):
+                self.terms.setdefault(match.group(), []).append(self.position)
+                self.position += 1
+
+    @contextlib.contextmanager
+    def collect(self):
+        # Taps the TextNode streams the renderer produces anyway, so indexing
+        # costs no extra pass over the markdown or the HTML
+        with observe_textnodes(self.add):
+            yield self
+
+
+def shard_name(term):
+    prefix = term[:PREFIX_LENGTH]
+    if prefix.isascii() and prefix.isalnum():
+        return prefix
+    return "_" + prefix.encode("utf-8").hex()
+
+def encode_positions(page_id, positions):
+    # Delta-encoded, so long pages mostly store small numbers
+    encoded = [page_id]
+    previous = 0
+    for position in positions:
+        encoded.append(position - previous)
+        previous = position
+    return encoded
+
+
+# Per-page postings persisted between builds, keyed by output path and
+# tagged with the source hash they were collected from.
+class SearchIndex:
+    def __init__(self, path):
+        self.path = path
+        self.pages = {}
+
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                self.pages = json.load(file).get("pages", {})
+
+    def is_fresh(self, dest, source_hash):
+        page = self.pages.get(os.path.normpath(dest))
+        return page is not None and source_hash is not None and page["hash"] == source_hash
+
+    def record(self, dest, source_hash, terms):
+        self.pages[os.path.normpath(dest)] = {"hash": source_hash, "terms": terms}
+
+    def shards(self, dests, output_dir, manifest):
+        documents = []
+        shards = {}
+        for dest in dests:
+            page = self.pages.get(os.path.normpath(dest))
+            entry = manifest.get(dest)
+            if page is None or entry is None or "title" not in entry:
+                continue
+
+            page_id = len(documents)
+            documents.append({"url": page_url(dest, output_dir), "title": entry["title"]})
+            for term, positions in page["terms"].items():
+                shards.setdefault(shard_name(term), {}).setdefault(term, []).append(encode_positions(page_id, positions))
+
+        return documents, shards
+
+    def write(self, pages, output_dir, manifest):
+        # Only pages that still exist are kept, so removed pages drop out of the index
+        dests = sorted(os.path.normpath(dest) for _, dest in pages)
+        self.pages = {dest: self.pages[dest] for dest in dests if dest in self.pages}
+        documents, shards = self.shards(dests, output_dir, manifest)
+
+        outputs = {"pages.json": {"prefix_length": PREFIX_LENGTH, "pages": documents, "shards": sorted(shards)}}
+        for name, terms in shards.items():
+            outputs[f"{name}.json"] = dict(sorted(terms.items()))
+
+        written = []
+        for filename, data in outputs.items():
+            path = os.path.join(output_dir, "search", filename)
+            if write_if_changed(path, json.dumps(data, ensure_ascii=False, separators=(",", ":"))):
+                written.append(path)
+            manifest.record(path, {"source": "generated"})
+
+        return written
+
+    def save(self):
+        save_json(self.path, {"pages": self.pages}, compact=True)
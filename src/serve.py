@@ -0,0 +1,177 @@
+import argparse
+import functools
+import http.server
+import os
+import sys
+import threading
+import time
+
+from cache import RenderCache
+from feeds import BLOG_DIR, write_site_indexes
+from highlight import HighlightCache
+from frontmatter import is_draft
+from main import build, collect_pages, copy_file, generate_pages
+from manifest import Manifest
+from template import TemplateRegistry
+
+
+def snapshot(paths):
+    files = {}
+    for path in paths:
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            files[path] = (stat.st_mtime_ns, stat.st_size)
+            continue
+
+        stack = [path] if os.path.isdir(path) else []
+        while stack:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        stack.append(entry.path)
+                    elif entry.is_file():
+                        stat = entry.stat()
+                        files[entry.path] = (stat.st_mtime_ns, stat.st_size)
+
+    return files
+
+def relative_to(path, root):
+    relpath = os.path.relpath(path, root)
+    if relpath == os.pardir or relpath.startswith(os.pardir + os.sep):
+        return None
+    return relpath
+
+
+class SiteWatcher:
+    def __init__(self, basepath="/", output_dir="./docs", static_path="./static", content_path="./content", template_path="./template.html", manifest=None, cache=None, site_url=None, layouts_path="./layouts"):
+        self.basepath = basepath
+        self.output_dir = output_dir
+        self.static_path = static_path
+        self.content_path = content_path
+        self.template_path = template_path
+        self.layouts_path = layouts_path
+        self.manifest = manifest if manifest is not None else Manifest("./.build/manifest.json", output_dir)
+        self.cache = cache
+        self.site_url = site_url
+        # Kept across rebuilds, so only layouts whose files changed are compiled again
+        self.registry = TemplateRegistry(template_path, layouts_path, content_path, basepath)
+        self.files = snapshot([content_path, static_path, template_path, layouts_path])
+
+    def poll(self):
+        files = snapshot([self.content_path, self.static_path, self.template_path, self.layouts_path])
+        changed = sorted(path for path, stamp in files.items() if self.files.get(path) != stamp)
+        removed = sorted(set(self.files) - set(files))
+        self.files = files
+
+        if changed or removed:
+            self.rebuild(changed, removed)
+        return changed, removed
+
+    def page_dest(self, path):
+        relpath = relative_to(path, self.content_path)
+        if relpath is None or not relpath.endswith(".md"):
+            return None
+        return os.path.join(self.output_dir, os.path.splitext(relpath)[0] + ".html")
+
+    def static_dest(self, path):
+        relpath = relative_to(path, self.static_path)
+        if relpath is None:
+            return None
+        return os.path.join(self.output_dir, relpath)
+
+    def is_layout(self, path):
+        return path == self.template_path or relative_to(path, self.layouts_path) is not None
+
+    def rebuild(self, changed, removed):
+        start = time.perf_counter()
+        for path in changed + removed:
+            self.manifest.invalidate(path)
+
+        pages = set()
+        drafts = []
+        layouts_changed = any(self.is_layout(path) for path in changed + removed)
+        if layouts_changed:
+            # Every page is checked, but only those whose layout or partials changed are stale
+            self.registry.refresh()
+            pages.update(collect_pages(self.content_path, self.output_dir))
+
+        for path in changed:
+            if (dest := self.page_dest(path)) is not None:
+                # A page just marked as a draft is taken down like a removed one
+                if is_draft(path):
+                    drafts.append(path)
+                    continue
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                pages.add((path, dest))
+            elif (dest := self.static_dest(path)) is not None:
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                try:
+                    copy_file(path, dest, self.manifest)
+                except OSError as e:
+                    print(f"Failed to copy {path} to {dest}. Reason: {e}")
+
+        for path in removed + drafts:
+            dest = self.page_dest(path) or self.static_dest(path)
+            if dest is not None and self.manifest.remove(dest, self.output_dir):
+                print(f"Removed output: {dest}")
+
+        if pages:
+            generate_pages(sorted(pages), self.template_path, self.basepath, self.manifest, registry=self.registry, cache=self.cache)
+
+        # Titles, summaries and the set of pages feed the sitemap, feed and listings
+        if pages or layouts_changed or drafts or any(self.page_dest(path) for path in removed):
+            all_pages = collect_pages(self.content_path, self.output_dir)
+            template = self.registry.get(self.registry.select(os.path.join(self.content_path, BLOG_DIR, "index.md")))
+            write_site_indexes(all_pages, self.manifest, self.output_dir, template, self.basepath, self.site_url)
+
+        self.manifest.save()
+        print(f"Rebuilt {len(changed)} changed and {len(removed)} removed file(s) in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    def watch(self, interval):
+        while True:
+            time.sleep(interval)
+            self.poll()
+
+
+def serve(directory, port):
+    handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=os.path.abspath(directory))
+    server = http.server.ThreadingHTTPServer(("", port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    print(f"Serving {directory} at http://localhost:{port}")
+    return server
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Build the site and serve ./docs, optionally rebuilding on change")
+    parser.add_argument("basepath", nargs="?", default="/", help="base path the site is served from")
+    parser.add_argument("-p", "--port", type=int, default=8888)
+    parser.add_argument("-w", "--watch", action="store_true", help="rebuild outputs whose sources change")
+    parser.add_argument("--interval", type=float, default=0.05, help="seconds between polls in watch mode")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="worker processes for the initial build (0 = all cores)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+
+    cache = RenderCache("./.build/render-cache")
+    highlights = HighlightCache("./.build/highlight.json")
+
+    # Snapshot before the initial build so edits made while it runs are picked up by the first poll
+    site_url = f"http://localhost:{args.port}"
+    watcher = SiteWatcher(args.basepath, cache=cache, site_url=site_url) if args.watch else None
+    manifest = watcher.manifest if watcher else None
+    build(args.basepath, args.jobs or os.cpu_count() or 1, manifest=manifest, cache=cache, site_url=site_url, highlights=highlights)
+
+    server = serve("./docs", args.port)
+    try:
+        if watcher:
+            watcher.watch(args.interval)
+        else:
+            threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from main import build
+from manifest import Manifest
+
+TEMPLATE = "<title>{{ Title }}</title><body>{{ Content }}</body>"
+
+
+# A throwaway site for tests that build: self.paths holds the build() keyword
+# arguments pointing into a temporary directory, with `template_text` as the
+# template and an empty content directory that subclasses fill in setUp.
+class SiteTestCase(unittest.TestCase):
+    template_text = TEMPLATE
+    # Builds only write sitemap.xml and the feed with a site URL
+    site_url = "https://example.com"
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.paths = {
+            "output_dir": os.path.join(self.root, "docs"),
+            "static_path": os.path.join(self.root, "static"),
+            "content_path": os.path.join(self.root, "content"),
+            "template_path": os.path.join(self.root, "template.html"),
+        }
+        self.manifest_path = os.path.join(self.root, ".build", "manifest.json")
+        os.makedirs(self.paths["content_path"])
+        self.write(self.paths["template_path"], self.template_text)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def source(self, *parts):
+        return os.path.join(self.paths["content_path"], *parts)
+
+    def output(self, *parts):
+        return os.path.join(self.paths["output_dir"], *parts)
+
+    def write(self, path, text, mtime=None):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(text)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+
+    def write_bytes(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as file:
+            file.write(data)
+
+    def read(self, *parts):
+        # An absolute path reads that file instead of one in the output directory
+        with open(self.output(*parts), encoding="utf-8") as file:
+            return file.read()
+
+    def build(self, basepath="/", **options):
+        # Builds with the build log captured; returns build()'s failures
+        options.setdefault("manifest", Manifest(self.manifest_path))
+        options.setdefault("site_url", self.site_url)
+        with contextlib.redirect_stdout(io.StringIO()):
+            return build(basepath, **options, **self.paths)
@@ -0,0 +1,139 @@
+import contextlib
+import json
+import time
+
+PHASES = ["clean", "static", "template", "read", "parse", "inline", "serialize", "write", "feeds", "search", "compress", "graph"]
+
+
+class BuildStats:
+    def __init__(self):
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.pages = {}
+        self.counters = {}
+        self.started = time.perf_counter()
+        self.finished = None
+        self._stack = []
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        # Phases are exclusive: time spent in a nested phase is not credited to the enclosing one
+        now = time.perf_counter()
+        if self._stack:
+            parent = self._stack[-1]
+            self.phases[parent[0]] += now - parent[1]
+        self._stack.append([name, now])
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            name, start = self._stack.pop()
+            self.phases[name] = self.phases.get(name, 0.0) + now - start
+            if self._stack:
+                self._stack[-1][1] = now
+
+    def timed_iter(self, iterable, name):
+        iterator = iter(iterable)
+        while True:
+            with self.phase(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    @contextlib.contextmanager
+    def instrument(self, module, name, phase):
+        original = getattr(module, name)
+
+        def timed(*args, **kwargs):
+            with self.phase(phase):
+                return original(*args, **kwargs)
+
+        setattr(module, name, timed)
+        try:
+            yield
+        finally:
+            setattr(module, name, original)
+
+    def record_page(self, path, seconds):
+        self.pages[path] = seconds
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def merge(self, other):
+        for name, seconds in other.phases.items():
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+        for name, n in other.counters.items():
+            self.count(name, n)
+        self.pages.update(other.pages)
+
+    def hit_rates(self):
+        # Share of hits for every `<name>_hit` / `<name>_miss` counter pair
+        rates = {}
+        for name in self.counters:
+            prefix, _, outcome = name.rpartition("_")
+            if outcome in ("hit", "miss") and prefix not in rates:
+                hits = self.counters.get(f"{prefix}_hit", 0)
+                total = hits + self.counters.get(f"{prefix}_miss", 0)
+                if total:
+                    rates[prefix] = hits / total
+        return dict(sorted(rates.items()))
+
+    def finish(self):
+        self.finished = time.perf_counter()
+
+    def wall_time(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    def slowest_pages(self, top):
+        return sorted(self.pages.items(), key=lambda item: (-item[1], item[0]))[:top]
+
+    def to_dict(self, top=10):
+        return {
+            "wall_seconds": round(self.wall_time(), 6),
+            "phases": {name: round(seconds, 6) for name, seconds in self.phases.items()},
+            "pages": len(self.pages),
+            "counters": dict(sorted(self.counters.items())),
+            "hit_rates": {name: round(rate, 4) for name, rate in self.hit_rates().items()},
+            "slowest_pages": [{"path": path, "seconds": round(seconds, 6)} for path, seconds in self.slowest_pages(top)],
+        }
+
+    def to_json(self, top=10):
+        return json.dumps(self.to_dict(top), indent=2)
+
+    def format_table(self, top=10):
+        total = sum(self.phases.values()) or 1.0
+        lines = [f"{'phase':12} {'seconds':>10} {'share':>7}"]
+        for name, seconds in self.phases.items():
+            lines.append(f"{name:12} {seconds:>10.4f} {seconds / total:>7.1%}")
+        lines.append(f"{'wall':12} {self.wall_time():>10.4f}")
+        lines.append(f"pages: {len(self.pages)}")
+        for name, n in sorted(self.counters.items()):
+            lines.append(f"{name}: {n}")
+        for name, rate in self.hit_rates().items():
+            lines.append(f"{name} hit rate: {rate:.1%}")
+
+        if self.pages:
+            lines.append(f"slowest {min(top, len(self.pages))} pages:")
+            for path, seconds in self.slowest_pages(top):
+                lines.append(f"  {seconds:>10.4f}  {path}")
+
+        return "\n".join(lines)
+
+
+class NullStats:
+    def phase(self, name):
+        return contextlib.nullcontext()
+
+    def timed_iter(self, iterable, name):
+        return iterable
+
+    def instrument(self, module, name, phase):
+        return contextlib.nullcontext()
+
+    def record_page(self, path, seconds):
+        pass
+
+    def count(self, name, n=1):
+        pass
@@ -0,0 +1,162 @@
+import hashlib
+import os
+import re
+
+from fileio import decode_text, file_stamp
+from optimize import minify_html
+
+PLACEHOLDER_RE = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+ASSET_REF_RE = re.compile(r'\b(src|href)="(/[^"]*)"')
+PARTIAL_RE = re.compile(r"\{\{>\s*([\w/-]+)\s*\}\}")
+
+DEFAULT_LAYOUT = "default"
+
+
+def rewrite_basepath(html, basepath):
+    if basepath == "/":
+        return html
+    return html.replace('href="/', f'href="{basepath}').replace('src="/', f'src="{basepath}')
+
+def rewrite_assets(html, assets):
+    # Points root-relative src/href references at fingerprinted asset URLs
+    if not assets:
+        return html
+
+    def replace(match):
+        asset = assets.get(match.group(2))
+        return match.group(0) if asset is None else f'{match.group(1)}="{asset["url"]}"'
+
+    return ASSET_REF_RE.sub(replace, html)
+
+
+class Template:
+    def __init__(self, text, basepath="/", assets=None, minify=False):
+        text = rewrite_basepath(rewrite_assets(text, assets), basepath)
+        self.minify = minify
+
+        # segments[i] is the static text before slots[i]; the last segment trails the final slot
+        self.segments = []
+        self.slots = []
+        last_idx = 0
+        for match in PLACEHOLDER_RE.finditer(text):
+            self.segments.append(text[last_idx:match.start()])
+            self.slots.append((match.group(1), match.group(0)))
+            last_idx = match.end()
+        self.segments.append(text[last_idx:])
+
+        # Rendered bodies carry no insignificant whitespace, so minifying the template once minifies every page
+        if minify:
+            self.segments = [minify_html(segment) for segment in self.segments]
+
+    def render(self, **values):
+        return "".join(self.iter_render(**values))
+
+    def iter_render(self, **values):
+        # A value is either a string or an iterable of string fragments
+        yield self.segments[0]
+        for (name, placeholder), segment in zip(self.slots, self.segments[1:]):
+            value = values.get(name, placeholder)
+            if isinstance(value, str):
+                yield value
+            else:
+                yield from value
+            yield segment
+
+    def write(self, fp, **values):
+        fp.writelines(self.iter_render(**values))
+
+
+def load_template(path, basepath="/", assets=None, minify=False):
+    with open(path, encoding="utf-8") as file:
+        return Template(file.read(), basepath, assets, minify)
+
+
+# Layouts compiled once and kept until one of their files changes. A page uses the
+# layout named by its `layout:` front matter, else layouts/<section>.html for pages
+# under content/<section>/ when that exists, else the default template. Partials
+# in layouts/partials/ are included with {{> name }} when a layout is compiled.
+class TemplateRegistry:
+    def __init__(self, template_path="./template.html", layouts_path="./layouts", content_path="./content", basepath="/", assets=None, minify=False):
+        self.template_path = template_path
+        self.layouts_path = layouts_path
+        self.content_path = content_path
+        self.basepath = basepath
+        self.assets = assets
+        self.minify = minify
+        # name -> (stamps, template, digest, files)
+        self.layouts = {}
+        self.sections = {}
+
+    def layout_path(self, name):
+        if name == DEFAULT_LAYOUT:
+            return self.template_path
+        if self.layouts_path is None:
+            raise ValueError(f"Unknown layout: {name}")
+        return os.path.join(self.layouts_path, f"{name}.html")
+
+    def partial_path(self, name):
+        if self.layouts_path is None:
+            raise ValueError(f"Unknown partial: {name}")
+        return os.path.join(self.layouts_path, "partials", f"{name}.html")
+
+    def select(self, source, meta=None):
+        if meta and "layout" in meta:
+            return str(meta["layout"])
+
+        if self.layouts_path is None:
+            return DEFAULT_LAYOUT
+        parts = os.path.relpath(source, self.content_path).replace(os.sep, "/").split("/")
+        if len(parts) == 1:
+            return DEFAULT_LAYOUT
+        section = parts[0]
+        if section not in self.sections:
+            self.sections[section] = os.path.isfile(self.layout_path(section))
+        return section if self.sections[section] else DEFAULT_LAYOUT
+
+    def get(self, name=DEFAULT_LAYOUT):
+        if name not in self.layouts:
+            self.compile(name)
+        return self.layouts[name][1]
+
+    def digest(self, name=DEFAULT_LAYOUT):
+        # Changes with the layout or any partial it includes, and with nothing else
+        self.get(name)
+        return self.layouts[name][2]
+
+    def files(self, name=DEFAULT_LAYOUT):
+        self.get(name)
+        return self.layouts[name][3]
+
+    def compile(self, name):
+        files = []
+        hashes = []
+        path = self.layout_path(name)
+        text = self.expand(path, files, hashes, (path,))
+        # A layout without partials keeps the plain file hash it had before partials existed
+        digest = hashes[0] if len(hashes) == 1 else hashlib.sha256("\0".join(hashes).encode("utf-8")).hexdigest()
+        files = list(dict.fromkeys(files))
+        template = Template(text, self.basepath, self.assets, self.minify)
+        self.layouts[name] = ([file_stamp(path) for path in files], template, digest, files)
+
+    def expand(self, path, files, hashes, stack):
+        with open(path, "rb") as file:
+            data = file.read()
+        files.append(path)
+        hashes.append(hashlib.sha256(data).hexdigest())
+        text = decode_text(data)
+
+        def include(match):
+            partial = self.partial_path(match.group(1))
+            if partial in stack:
+                raise ValueError(f"Partial {match.group(1)} includes itself")
+            return self.expand(partial, files, hashes, stack + (partial,))
+
+        return PARTIAL_RE.sub(include, text)
+
+    def refresh(self):
+        # Forgets layouts whose layout or partial files changed on disk; returns their names
+        stale = [name for name, (stamps, _, _, files) in self.layouts.items() if stamps != [file_stamp(path) for path in files]]
+        for name in stale:
+            del self.layouts[name]
+        self.sections.clear()
+        return stale
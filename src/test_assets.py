@@ -0,0 +1,84 @@
+import os
+import struct
+import unittest
+
+import helper
+from assets import AssetStore, fingerprint, png_size
+from sitetest import SiteTestCase
+
+TEMPLATE = '<link href="/images/logo.png" /><img src="/images/missing.png" />{{ Content }}'
+
+def png(width, height):
+    return b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + struct.pack(">II", width, height) + b"\x08\x06\x00\x00\x00"
+
+class TestAssets(SiteTestCase):
+    template_text = TEMPLATE
+
+    def setUp(self):
+        super().setUp()
+        self.store_path = os.path.join(self.root, ".build", "assets.json")
+        os.makedirs(os.path.join(self.paths["static_path"], "images"))
+        self.write(self.source("index.md"), "# Home page\n\n![Logo](/images/logo.png) ![Other](/elsewhere.png) [Full size](/images/logo.png)")
+        self.write_bytes(self.image("logo.png"), png(640, 480))
+        self.write_bytes(self.image("photo.jpg"), b"not really a jpeg")
+
+    def tearDown(self):
+        helper.set_image_assets(None)
+        super().tearDown()
+
+    def image(self, name):
+        return os.path.join(self.paths["static_path"], "images", name)
+
+    def build(self, fingerprint=True):
+        store = AssetStore(self.store_path) if fingerprint else None
+        super().build(asset_store=store)
+        return store
+
+    def test_png_size_reads_header_only(self):
+        self.assertEqual(png_size(self.image("logo.png")), (640, 480))
+        self.assertIsNone(png_size(self.image("photo.jpg")))
+
+    def test_fingerprint(self):
+        self.assertEqual(fingerprint("/images/logo.png", "0123456789abcdef"), "/images/logo.0123456789.png")
+
+    def test_collect_skips_unchanged_images(self):
+        store = AssetStore(self.store_path)
+        assets = store.collect(self.paths["static_path"])
+        self.assertEqual(set(assets), {"/images/logo.png", "/images/photo.jpg"})
+        self.assertEqual((assets["/images/logo.png"]["width"], assets["/images/logo.png"]["height"]), (640, 480))
+        self.assertNotIn("width", assets["/images/photo.jpg"])
+        store.save()
+
+        # Same size and mtime: the stored fingerprint is trusted without reading the file
+        stat = os.stat(self.image("photo.jpg"))
+        self.write_bytes(self.image("photo.jpg"), b"NOT REALLY A JPEG")
+        os.utime(self.image("photo.jpg"), ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertEqual(AssetStore(self.store_path).collect(self.paths["static_path"]), assets)
+
+    def test_build_rewrites_image_references(self):
+        self.build()
+        url = AssetStore(self.store_path).collect(self.paths["static_path"])["/images/logo.png"]["url"]
+        html = self.read("index.html")
+
+        self.assertIn(f'<img src="{url}" alt="Logo" width="640" height="480"></img>', html)
+        self.assertIn('<img src="/elsewhere.png" alt="Other"></img>', html)
+        self.assertIn(f'<a href="{url}">Full size</a>', html)
+        self.assertIn(f'<link href="{url}" />', html)
+        self.assertIn('<img src="/images/missing.png" />', html)
+        self.assertTrue(os.path.exists(os.path.join(self.paths["output_dir"], url[1:])))
+        self.assertFalse(os.path.exists(os.path.join(self.paths["output_dir"], "images", "logo.png")))
+
+    def test_changed_image_rebuilds_pages(self):
+        self.build()
+        self.write_bytes(self.image("logo.png"), png(32, 32))
+        self.build()
+
+        self.assertIn('width="32" height="32"', self.read("index.html"))
+        self.assertEqual(len(os.listdir(os.path.join(self.paths["output_dir"], "images"))), 2)
+
+        self.build(fingerprint=False)
+        self.assertIn('<img src="/images/logo.png" alt="Logo"></img>', self.read("index.html"))
+        self.assertTrue(os.path.exists(os.path.join(self.paths["output_dir"], "images", "logo.png")))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import contextlib
+import io
+import os
+import unittest
+from unittest import mock
+
+import builder
+import helper
+from assets import AssetStore
+from builder import Builder
+from cache import RenderCache
+from sitetest import SiteTestCase
+from test_assets import png
+
+class TestBuilder(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.write(self.source("index.md"), "# Home page\n\n[Blog](/blog/post)")
+        self.write(self.source("blog", "post.md"), "# Blog post\n\nHello")
+        self.builder = Builder("/site/", site_url=self.site_url, **self.paths)
+
+    def tearDown(self):
+        helper.set_image_assets(None)
+        super().tearDown()
+
+    def test_render_page(self):
+        self.assertEqual(
+            self.builder.render_page(self.source("index.md")),
+            '<title>Home page</title><body><div><h1>Home page</h1><p><a href="/site/blog/post">Blog</a></p></div></body>',
+        )
+
+    def test_render_site_writes_nothing_to_disk(self):
+        outputs, failures = self.builder.render_site()
+
+        self.assertEqual(failures, [])
+        self.assertEqual(set(outputs), {"index.html", "blog/post.html", "blog/feed.xml", "blog/index.html", "sitemap.xml"})
+        self.assertIn("<h1>Blog post</h1>", outputs["blog/post.html"])
+        self.assertFalse(os.path.exists(self.paths["output_dir"]))
+
+    def test_render_site_matches_build(self):
+        outputs, _ = self.builder.render_site()
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.builder.build()
+
+        for relpath, text in outputs.items():
+            with open(os.path.join(self.paths["output_dir"], relpath), encoding="utf-8") as file:
+                self.assertEqual(file.read(), text, relpath)
+
+    def test_builds_keep_their_manifest_by_output_dir(self):
+        other = Builder("/site/", **{**self.paths, "output_dir": os.path.join(self.root, "service", "out")})
+        self.assertEqual(self.builder.build_dir, os.path.join(self.root, ".build"))
+        self.assertEqual(other.build_dir, os.path.join(self.root, "service", ".build"))
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.builder.build()
+            other.build()
+            self.builder.build()
+        self.assertTrue(os.path.exists(os.path.join(self.paths["output_dir"], "index.html")))
+        self.assertTrue(os.path.exists(os.path.join(other.output_dir, "index.html")))
+
+    def test_unchanged_pages_stay_warm(self):
+        cache = RenderCache(os.path.join(self.root, ".build", "render-cache"))
+        self.builder.cache = cache
+        written = []
+        self.builder.write_site(lambda relpath, text: written.append(relpath))
+
+        with mock.patch.object(builder, "render_body", wraps=builder.render_body) as render_body:
+            self.builder.write_site(lambda relpath, text: None)
+            self.assertEqual(render_body.call_count, 0)
+
+            self.write(self.source("blog", "post.md"), "# Blog post\n\nChanged")
+            self.write(self.paths["template_path"], "<main>{{ Content }}</main>")
+            outputs, _ = self.builder.render_site()
+            self.assertEqual(render_body.call_count, 1)
+
+        self.assertEqual(len(written), 5)
+        self.assertEqual(outputs["blog/post.html"], "<main><div><h1>Blog post</h1><p>Changed</p></div></main>")
+
+        # A fresh builder starts from the render cache instead of parsing again
+        with mock.patch.object(builder, "render_body") as render_body:
+            Builder("/site/", cache=cache, **self.paths).render_site()
+            render_body.assert_not_called()
+
+    def test_builders_do_not_share_asset_maps(self):
+        os.makedirs(os.path.join(self.paths["static_path"], "images"))
+        with open(os.path.join(self.paths["static_path"], "images", "logo.png"), "wb") as file:
+            file.write(png(2, 1))
+        self.write(self.source("blog", "post.md"), "# Blog post\n\n![Logo](/images/logo.png)")
+        fingerprinted = Builder("/", asset_store=AssetStore(os.path.join(self.root, "assets.json")), **self.paths)
+
+        self.assertRegex(fingerprinted.render_page(self.source("blog", "post.md")), r'src="/images/logo\.\w+\.png"')
+        self.assertIn('src="/images/logo.png"', Builder("/", **self.paths).render_page(self.source("blog", "post.md")))
+
+    def test_failing_page_is_reported(self):
+        with open(self.source("broken.md"), "wb") as file:
+            file.write(b"# Broken\xff")
+        outputs, failures = self.builder.render_site()
+
+        self.assertEqual([failure[:2] for failure in failures], [(self.source("broken.md"), "broken.html")])
+        self.assertNotIn("broken.html", outputs)
+        self.assertIn("index.html", outputs)
+
+if __name__ == "__main__":
+    unittest.main()
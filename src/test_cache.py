@@ -0,0 +1,78 @@
+import io
+import os
+import tempfile
+import threading
+import unittest
+
+from cache import RenderCache, iter_chunks
+from fileio import read_chunks
+
+class TestRenderCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = RenderCache(os.path.join(self.tmp.name, "cache"), max_bytes=1024)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_key_depends_on_markdown_and_context(self):
+        self.assertEqual(self.cache.key([b"# a"]), self.cache.key([b"#", b" a"]))
+        self.assertNotEqual(self.cache.key([b"# a"]), self.cache.key([b"# b"]))
+        self.assertNotEqual(self.cache.key([b"# a"]), self.cache.key([b"# a"], context="other"))
+
+    def test_get_and_put(self):
+        key = self.cache.key([b"# Title\n\nbody"])
+        self.assertIsNone(self.cache.get(key))
+        self.cache.put(key, "Title", "<div><p>body\r\n</p></div>", "body")
+        self.assertEqual(self.cache.get(key), ("Title", "body", "<div><p>body\r\n</p></div>"))
+
+    def test_open_streams_entry(self):
+        key = self.cache.key(read_chunks(__file__))
+        self.assertIsNone(self.cache.open(key))
+        self.cache.put(key, "Title", "<p>body</p>")
+
+        title, summary, file = self.cache.open(key)
+        with file:
+            self.assertEqual((title, summary, file.read()), ("Title", "", "<p>body</p>"))
+
+    def test_iter_chunks_cut_after_tags(self):
+        html = '<p><a href="/first">x</a></p>' * 20
+        chunks = list(iter_chunks(io.StringIO(html), size=7))
+        self.assertEqual("".join(chunks), html)
+        self.assertTrue(all(chunk.endswith(">") for chunk in chunks))
+
+    def test_failed_write_leaves_no_entry(self):
+        key = self.cache.key([b"# Title"])
+        with self.assertRaises(RuntimeError):
+            with self.cache.writer(key, "Title") as file:
+                file.write("<div>")
+                raise RuntimeError("render failed")
+
+        self.assertIsNone(self.cache.get(key))
+        self.assertEqual(os.listdir(os.path.dirname(self.cache.entry_path(key))), [])
+
+    def test_evict_least_recently_used(self):
+        keys = [self.cache.key([bytes([i])]) for i in range(4)]
+        for i, key in enumerate(keys):
+            self.cache.put(key, "Title", "x" * 400)
+            os.utime(self.cache.entry_path(key), ns=(i, i))
+        os.utime(self.cache.entry_path(keys[0]), ns=(10, 10))
+
+        self.assertEqual(self.cache.evict(), 2)
+        self.assertIsNotNone(self.cache.get(keys[0]))
+        self.assertIsNone(self.cache.get(keys[1]))
+        self.assertIsNone(self.cache.get(keys[2]))
+        self.assertIsNotNone(self.cache.get(keys[3]))
+
+    def test_concurrent_writers(self):
+        key = self.cache.key([b"# Title"])
+        threads = [threading.Thread(target=self.cache.put, args=(key, "Title", "<p>same</p>")) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.cache.get(key), ("Title", "", "<p>same</p>"))
+
+if __name__ == "__main__":
+    unittest.main()
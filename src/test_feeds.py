@@ -0,0 +1,93 @@
+import json
+import os
+import unittest
+
+from feeds import listing_pages, page_url, rss_xml, sitemap_xml
+from sitetest import SiteTestCase
+
+class TestFeeds(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.write(self.source("index.md"), "# Home page\n\nHello & welcome")
+        self.write(self.source("blog", "first.md"), "# First post\n\n## Intro\n\nThe **first** [post](/blog/)\nof many", mtime=1_000_000)
+        self.write(self.source("blog", "second", "index.md"), "# Second post\n\n- no paragraph", mtime=2_000_000)
+
+    def test_page_url(self):
+        self.assertEqual(page_url(self.output("index.html"), self.paths["output_dir"]), "/")
+        self.assertEqual(page_url(self.output("blog", "second", "index.html"), self.paths["output_dir"]), "/blog/second/")
+        self.assertEqual(page_url(self.output("blog", "first.html"), self.paths["output_dir"]), "/blog/first.html")
+
+    def test_sitemap_and_feed(self):
+        self.build("/site/")
+
+        sitemap = self.read("sitemap.xml")
+        self.assertIn("<loc>https://example.com/site/</loc>", sitemap)
+        self.assertIn("<loc>https://example.com/site/blog/first.html</loc><lastmod>1970-01-12</lastmod>", sitemap)
+        self.assertIn("<loc>https://example.com/site/blog/second/</loc>", sitemap)
+
+        feed = self.read("blog", "feed.xml")
+        self.assertLess(feed.index("<title>Second post</title>"), feed.index("<title>First post</title>"))
+        self.assertIn("<description>The first post of many</description>", feed)
+        self.assertIn("<pubDate>Mon, 12 Jan 1970 13:46:40 GMT</pubDate>", feed)
+        self.assertNotIn("Home page", feed)
+
+    def test_no_site_url_skips_sitemap_and_feed(self):
+        self.build()
+        self.build(site_url=None)
+
+        self.assertFalse(os.path.exists(self.output("sitemap.xml")))
+        self.assertFalse(os.path.exists(self.output("blog", "feed.xml")))
+        self.assertTrue(os.path.exists(self.output("blog", "index.html")))
+
+    def test_blog_listing(self):
+        self.build("/site/")
+
+        listing = self.read("blog", "index.html")
+        self.assertIn('<a href="/site/blog/second/">Second post</a>', listing)
+        self.assertIn('<a href="/site/blog/first.html">First post</a></h2><p>The first post of many</p>', listing)
+        self.assertNotIn("<nav>", listing)
+
+    def test_listing_pagination(self):
+        posts = [{"url": f"/blog/{i}/", "title": f"Post {i}", "summary": "", "mtime": 0} for i in range(5)]
+        pages = [(url, node.to_html()) for url, node in listing_pages(posts, 2)]
+
+        self.assertEqual([url for url, _ in pages], ["/blog/", "/blog/page/2/", "/blog/page/3/"])
+        self.assertIn('<nav><a href="/blog/">Newer posts</a><a href="/blog/page/3/">Older posts</a></nav>', pages[1][1])
+
+    def test_handwritten_blog_index_wins(self):
+        self.write(self.source("blog", "index.md"), "# My blog\n\nHand written")
+        self.build()
+
+        self.assertIn("Hand written", self.read("blog", "index.html"))
+        self.assertIn("<title>First post</title>", self.read("blog", "feed.xml"))
+
+    def test_skipped_pages_contribute_from_manifest(self):
+        self.build()
+        with open(self.manifest_path, encoding="utf-8") as file:
+            entry = json.load(file)["outputs"][os.path.normpath(self.output("blog", "first.html"))]
+        self.assertEqual((entry["title"], entry["summary"]), ("First post", "The first post of many"))
+
+        # Only the home page is regenerated; the others are skipped and never read
+        self.write(self.source("index.md"), "# Home page\n\nHello again")
+        self.build()
+
+        self.assertIn("<title>First post</title>", self.read("blog", "feed.xml"))
+        self.assertIn("blog/second/", self.read("sitemap.xml"))
+
+    def test_unchanged_indexes_are_not_rewritten(self):
+        self.build()
+        os.utime(self.output("sitemap.xml"), ns=(0, 0))
+        self.build()
+
+        self.assertEqual(os.stat(self.output("sitemap.xml")).st_mtime_ns, 0)
+
+    def test_xml_is_escaped(self):
+        page = {"url": "/blog/a&b/", "title": "Tom & Jerry", "summary": "<3", "mtime": 0, "date": 0}
+
+        self.assertIn("<loc>https://example.com/blog/a&amp;b/</loc>", sitemap_xml([page], "https://example.com/", "/"))
+        feed = rss_xml([page], "https://example.com", "/")
+        self.assertIn("<title>Tom &amp; Jerry</title>", feed)
+        self.assertIn("<description>&lt;3</description>", feed)
+
+if __name__ == "__main__":
+    unittest.main()
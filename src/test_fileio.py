@@ -0,0 +1,36 @@
+import json
+import os
+import tempfile
+import unittest
+
+from fileio import decode_text, file_stamp, save_json
+
+class TestFileIO(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, ".build", "store.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_save_json(self):
+        save_json(self.path, {"b": 1, "a": [1, 2]}, compact=True)
+        with open(self.path, encoding="utf-8") as file:
+            self.assertEqual(file.read(), '{"a":[1,2],"b":1}')
+
+        save_json(self.path, {"a": 1})
+        with open(self.path, encoding="utf-8") as file:
+            self.assertEqual(json.load(file), {"a": 1})
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ["store.json"])
+
+    def test_file_stamp(self):
+        self.assertIsNone(file_stamp(self.path))
+        save_json(self.path, {})
+        stat = os.stat(self.path)
+        self.assertEqual(file_stamp(self.path), (stat.st_mtime_ns, stat.st_size))
+
+    def test_decode_text_matches_text_mode(self):
+        self.assertEqual(decode_text(b"a\r\nb\rc\n"), "a\nb\nc\n")
+
+if __name__ == "__main__":
+    unittest.main()
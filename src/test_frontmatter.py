@@ -0,0 +1,88 @@
+import io
+import os
+import unittest
+from unittest import mock
+
+import helper
+from frontmatter import parse_front_matter, read_front_matter, split_front_matter
+from sitetest import SiteTestCase
+
+POST = """---
+title: "Dated: a post"
+date: 2020-01-02
+tags: [python, web]
+---
+# Heading
+
+Body text
+"""
+
+class TestFrontMatter(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.write(self.source("index.md"), "# Home page")
+        self.write(self.source("blog", "dated.md"), POST)
+        self.write(self.source("blog", "undated.md"), "# Undated post\n\nDated by its mtime")
+        os.utime(self.source("blog", "dated.md"), (2_000_000_000, 2_000_000_000))
+        os.utime(self.source("blog", "undated.md"), (1_700_000_000, 1_700_000_000))
+
+    def test_parse_front_matter(self):
+        lines = ["title: 'Quoted'\n", "# comment\n", "count: 3\n", "draft: yes\n", "empty: ~\n", "tags:\n", "  - a\n", "  - b c\n"]
+        self.assertEqual(
+            parse_front_matter(lines),
+            {"title": "Quoted", "count": 3, "draft": True, "empty": None, "tags": ["a", "b c"]},
+        )
+        with self.assertRaises(ValueError):
+            parse_front_matter(["not a key\n"])
+
+    def test_reader_stops_at_closing_fence(self):
+        file = io.StringIO(POST)
+        self.assertEqual(read_front_matter(file), {"title": "Dated: a post", "date": "2020-01-02", "tags": ["python", "web"]})
+        self.assertEqual(file.readline(), "# Heading\n")
+
+        file = io.StringIO("# No front matter\n")
+        self.assertEqual(read_front_matter(file), {})
+        self.assertEqual(file.tell(), 0)
+
+        self.assertEqual(split_front_matter("---\n---\nrest"), ({}, "rest"))
+        with self.assertRaises(ValueError):
+            read_front_matter(io.StringIO("---\ntitle: x\n"))
+
+    def test_front_matter_is_not_rendered(self):
+        self.build()
+
+        self.assertEqual(
+            self.read("blog", "dated.html"),
+            "<title>Dated: a post</title><body><div><h1>Heading</h1><p>Body text</p></div></body>",
+        )
+        # The front-matter date predates the undated post, though the file itself is newer
+        feed = self.read("blog", "feed.xml")
+        self.assertLess(feed.index("Undated post"), feed.index("Dated: a post"))
+        self.assertIn("<pubDate>Thu, 02 Jan 2020 00:00:00 GMT</pubDate>", feed)
+
+    def test_drafts_are_skipped_before_parsing(self):
+        self.write(self.source("blog", "draft.md"), "---\ndraft: true\n---\n# Draft")
+        with mock.patch.object(helper, "block_to_html_node", wraps=helper.block_to_html_node) as parse:
+            self.build()
+        blocks = [call.args[0] for call in parse.call_args_list]
+        self.assertIn("# Home page", blocks)
+        self.assertNotIn("# Draft", blocks)
+
+        self.assertFalse(os.path.exists(self.output("blog", "draft.html")))
+        self.assertNotIn("/blog/draft.html", self.read("sitemap.xml"))
+
+        self.build(drafts=True)
+        self.assertIn("<h1>Draft</h1>", self.read("blog", "draft.html"))
+
+        self.build()
+        self.assertFalse(os.path.exists(self.output("blog", "draft.html")))
+
+    def test_invalid_front_matter_fails_its_page(self):
+        self.write(self.source("broken.md"), "---\ntitle: x\nnot valid\n---\n# Broken")
+        failures = self.build()
+
+        self.assertEqual([failure[0] for failure in failures], [self.source("broken.md")])
+        self.assertIn("line 3", failures[0][2])
+
+if __name__ == "__main__":
+    unittest.main()
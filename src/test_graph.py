@@ -0,0 +1,78 @@
+import contextlib
+import io
+import os
+import unittest
+
+from cache import RenderCache
+from graph import DependencyGraph, PageLinks, main, site_path
+from helper import markdown_to_html_node
+from main import build
+from manifest import Manifest
+from sitetest import SiteTestCase
+
+class TestGraph(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.graph_path = os.path.join(self.root, ".build", "graph.json")
+        self.write(os.path.join(self.paths["static_path"], "images", "logo.png"), "png")
+        self.write(self.source("index.md"), "# Home page\n\n[Post](/blog/post) and [away](https://example.com) [top](#top)")
+        self.write(self.source("blog", "post", "index.md"), "# Post\n\n[Home](/) ![Logo](../../images/logo.png) [Gone](/missing)")
+
+    def build(self, cache=None):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            build(manifest=Manifest(self.manifest_path), cache=cache, **self.paths)
+        return output.getvalue()
+
+    def test_page_links_are_collected_once(self):
+        with PageLinks().collect() as links:
+            markdown_to_html_node("[a](/a) [b](/b) [a](/a)\n\n![x](/x.png)")
+        self.assertEqual((links.links, links.images), (["/a", "/b"], ["/x.png"]))
+
+    def test_site_path(self):
+        self.assertEqual(site_path("../../images/logo.png", "/blog/post/"), "/images/logo.png")
+        self.assertEqual(site_path("/blog/post#comments"), "/blog/post")
+        self.assertIsNone(site_path("https://example.com/"))
+        self.assertIsNone(site_path("#top"))
+
+    def test_build_records_edges_and_broken_links(self):
+        output = self.build()
+        graph = DependencyGraph(self.graph_path)
+        home = os.path.normpath(self.source("index.md"))
+        post = os.path.normpath(self.source("blog", "post", "index.md"))
+        logo = os.path.normpath(os.path.join(self.paths["static_path"], "images", "logo.png"))
+
+        self.assertEqual(graph.affected(logo), [post])
+        self.assertEqual(graph.affected(self.paths["template_path"]), [post, home])
+        self.assertEqual(graph.dependents(home, ("link",)), [post])
+        self.assertEqual(graph.dependents(post, ("link",)), [home])
+        self.assertEqual(graph.broken_links(), [(post, "/missing")])
+        self.assertIn(f"Broken link in {post}: /missing", output)
+
+    def test_cached_pages_keep_their_edges(self):
+        cache = RenderCache(os.path.join(self.root, ".build", "render-cache"))
+        self.build(cache)
+        # A changed template re-renders every page from the cache without parsing
+        self.write(self.paths["template_path"], "<main>{{ Content }}</main>")
+        self.build(cache)
+
+        graph = DependencyGraph(self.graph_path)
+        self.assertEqual(len(graph.pages), 2)
+        self.assertEqual(len(graph.broken_links()), 1)
+
+        self.write(self.source("blog", "post", "index.md"), "# Post\n\n[Home](/)")
+        self.build(cache)
+        self.assertEqual(DependencyGraph(self.graph_path).broken_links(), [])
+
+    def test_query_cli(self):
+        self.build()
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            main(["--graph", self.graph_path, "--broken", os.path.join(self.paths["static_path"], "images", "logo.png")])
+
+        post = os.path.normpath(self.source("blog", "post", "index.md"))
+        self.assertIn(f": {post}\n", output.getvalue())
+        self.assertIn(f"{post}: broken link /missing\n", output.getvalue())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,11 @@
+import io
+import threading
 import unittest
 
+import helper
+
 from blocknode import BlockType
-from helper import block_to_block_type, block_to_html_node, code_block_to_html_node, extract_markdown_images, extract_markdown_links, extract_title, heading_block_to_html_node, markdown_to_blocks, markdown_to_html_node, ordered_list_block_to_html_node, quote_block_to_html_node, split_nodes_delimiter, split_nodes_image, split_nodes_link, text_node_to_html_node, text_to_textnodes, unordered_list_block_to_html_node
+from helper import take_leaf_counts, iter_blocks, iter_blocks_html, block_to_block_type, block_to_html_node, code_block_to_html_node, extract_markdown_images, extract_markdown_links, extract_summary, extract_title, heading_block_to_html_node, markdown_to_blocks, markdown_to_html_node, ordered_list_block_to_html_node, quote_block_to_html_node, split_nodes_delimiter, split_nodes_image, split_nodes_link, text_node_to_html_node, text_to_textnodes, unordered_list_block_to_html_node
 from textnode import TextNode, TextType
 
 class TestHelper(unittest.TestCase):
@@ -30,6 +34,58 @@ class TestHelper(unittest.TestCase):
             "href": "https://picsum.photos/",
         })
 
+    def test_links_and_images_are_interned(self):
+        take_leaf_counts()
+        html = markdown_to_html_node("[Home](/nav) and [Home](/nav) ![Badge](/b.png)\n\n[Home](/nav)").to_html()
+        first = text_node_to_html_node(TextNode("Home", TextType.LINK, "/nav"))
+
+        self.assertIs(first, text_node_to_html_node(TextNode("Home", TextType.LINK, "/nav")))
+        self.assertIsNot(first, text_node_to_html_node(TextNode("Away", TextType.LINK, "/nav")))
+        self.assertEqual(first.to_html(), '<a href="/nav">Home</a>')
+        self.assertEqual(html.count('<a href="/nav">Home</a>'), 3)
+        hits, misses = take_leaf_counts()
+        self.assertEqual(hits + misses, 7)
+        self.assertGreaterEqual(hits, 4)
+
+    def test_interned_images_follow_asset_map(self):
+        node = TextNode("Logo", TextType.IMAGE, "/logo.png")
+        self.assertEqual(text_node_to_html_node(node).props["src"], "/logo.png")
+        helper.set_image_assets({"/logo.png": {"url": "/logo.abc.png"}})
+        try:
+            self.assertEqual(text_node_to_html_node(node).props["src"], "/logo.abc.png")
+        finally:
+            helper.set_image_assets(None)
+        self.assertEqual(text_node_to_html_node(node).props["src"], "/logo.png")
+
+    def test_text_and_attributes_are_escaped(self):
+        self.assertEqual(text_node_to_html_node(TextNode("a < b && c", TextType.TEXT)).value, "a &lt; b &amp;&amp; c")
+        self.assertEqual(text_node_to_html_node(TextNode("<br>", TextType.CODE)).to_html(), "<code>&lt;br&gt;</code>")
+        self.assertEqual(
+            text_node_to_html_node(TextNode('"Q&A"', TextType.IMAGE, '/q.png?a=1&b="2"')).to_html(),
+            '<img src="/q.png?a=1&amp;b=&quot;2&quot;" alt="&quot;Q&amp;A&quot;"></img>',
+        )
+
+    def test_urls_are_resolved_against_basepath(self):
+        with helper.use_basepath("/site/"):
+            html = markdown_to_html_node('[Home](/) [Ext](https://x.org/) [CDN](//cdn.org/a) ![A](/a.png)\n\n```\nhref="/x"\n```').to_html()
+        self.assertEqual(
+            html,
+            '<div><p><a href="/site/">Home</a> <a href="https://x.org/">Ext</a> <a href="//cdn.org/a">CDN</a> '
+            '<img src="/site/a.png" alt="A"></img></p><pre><code>href="/x"</code></pre></div>',
+        )
+        self.assertEqual(text_node_to_html_node(TextNode("Home", TextType.LINK, "/")).to_html(), '<a href="/">Home</a>')
+
+    def test_textnode_observers_are_per_thread(self):
+        seen = []
+        with helper.observe_textnodes(seen.extend):
+            thread = threading.Thread(target=text_to_textnodes, args=("elsewhere",))
+            thread.start()
+            thread.join()
+            text_to_textnodes("here")
+
+        text_to_textnodes("after")
+        self.assertEqual([node.text for node in seen], ["here"])
+
     def test_bold(self):
         node = TextNode("This is a bold node", TextType.BOLD)
         html_node = text_node_to_html_node(node)
@@ -154,6 +210,29 @@ class TestHelper(unittest.TestCase):
             text_nodes
         )
 
+    def test_text_to_textnodes_matches_chained_splits(self):
+        texts = [
+            "This is **text** with an _italic_ word and a `code block` and an ![obi wan image](https://i.imgur.com/fJRm4Vk.jpeg) and a [link](https://boot.dev)",
+            "This is text with an [link](https://i.imgur.com/zjjcJKZ.png) and another [second link](https://i.imgur.com/3elNhQu.png)",
+            "This is text with an ![image](https://i.imgur.com/zjjcJKZ.png) and another ![second image](https://i.imgur.com/3elNhQu.png)",
+            "This is text with a **bold** word",
+            "plain text",
+            "use snake_case with [docs](/my_page) here",
+            "**[l](/u)**",
+            "run `a_b **c**` now",
+            "compute 2 ** 3 and `print`",
+        ]
+        for text in texts:
+            nodes = split_nodes_link(split_nodes_image([TextNode(text, TextType.TEXT)]))
+            nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
+            nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
+            nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
+            self.assertListEqual(nodes, text_to_textnodes(text))
+
+    def test_text_to_textnodes_delimiters_never_swallow_links(self):
+        self.assertIn(TextNode("docs", TextType.LINK, "/my_page"), text_to_textnodes("use snake_case with [docs](/my_page) here"))
+        self.assertIn(TextNode("l", TextType.LINK, "/u"), text_to_textnodes("**[l](/u)**"))
+
     def test_markdown_to_blocks(self):
         md = """
 This is **bolded** paragraph
@@ -238,6 +317,14 @@ This is the same paragraph on a new line
             block_type
         )
 
+    def test_block_to_block_type_mixed_lines_fall_back_to_paragraph(self):
+        self.assertEqual(BlockType.PARAGRAPH, block_to_block_type("1. first\nsecond"))
+        self.assertEqual(BlockType.PARAGRAPH, block_to_block_type("- first\nsecond"))
+        self.assertEqual(BlockType.PARAGRAPH, block_to_block_type("> first\nsecond"))
+        self.assertEqual(BlockType.PARAGRAPH, block_to_block_type("1.\n2. item"))
+        self.assertEqual(BlockType.PARAGRAPH, block_to_block_type("####### seven"))
+        self.assertEqual(BlockType.PARAGRAPH, block_to_block_type(""))
+
     def test_heading_block_to_html_node(self):
         block = "### This is title"
 
@@ -349,5 +436,67 @@ This is another paragraph with _italic_ text and `code` here
             title
         )
 
+    def test_iter_blocks_matches_markdown_to_blocks(self):
+        md = """
+This is **bolded** paragraph
+
+
+
+This is another paragraph with _italic_ text and `code` here
+This is the same paragraph on a new line
+  
+- This is a list
+- with items
+"""
+        self.assertListEqual(
+            markdown_to_blocks(md),
+            list(iter_blocks(io.StringIO(md))),
+        )
+
+    def test_iter_blocks_html_matches_markdown_to_html_node(self):
+        md = "# Heading here\n\nSome **bold** text\n\n```\ncode\n```\n\n1. one\n2. two"
+        self.assertEqual(
+            markdown_to_html_node(md).to_html(),
+            "".join(iter_blocks_html(iter_blocks(io.StringIO(md)))),
+        )
+
+    def test_iter_blocks_html_without_blocks(self):
+        with self.assertRaises(ValueError):
+            list(iter_blocks_html([]))
+
+    def test_extract_title_from_lines_stops_at_first_h1(self):
+        def lines():
+            yield "intro\n"
+            yield "# This is heading\n"
+            raise AssertionError("read past the title")
+
+        self.assertEqual("This is heading", extract_title(lines()))
+
+    def test_extract_title_without_h1(self):
+        with self.assertRaises(ValueError):
+            extract_title("## Not a title\n#Nor this")
+
+    def test_extract_summary_is_first_paragraph_as_text(self):
+        md = "# Title\n\n> quoted\n\nThe **first** [paragraph](/a)\nwith `code`\n\nSecond paragraph"
+        self.assertEqual("The first paragraph with code", extract_summary(md))
+        self.assertEqual("The first paragraph with code", extract_summary(io.StringIO(md)))
+        self.assertEqual("", extract_summary("# Title\n\n- item"))
+        self.assertEqual("Prose", extract_summary("[< Back Home](/)\n\n![logo](/a.png) [x](/)\n\nProse"))
+
+    def test_extract_summary_from_lines_stops_at_first_paragraph(self):
+        def lines():
+            yield "# Title\n"
+            yield "\n"
+            yield "Summary\n"
+            yield "\n"
+            raise AssertionError("read past the summary")
+
+        self.assertEqual("Summary", extract_summary(lines()))
+
+    def test_extract_summary_is_truncated_at_a_word(self):
+        summary = extract_summary("word " * 100)
+        self.assertLessEqual(len(summary), 283)
+        self.assertTrue(summary.endswith("word..."))
+
 if __name__ == "__main__":
     unittest.main()
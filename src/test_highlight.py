@@ -0,0 +1,101 @@
+import json
+import os
+import unittest
+from unittest import mock
+
+import helper
+from cache import RenderCache
+from helper import code_block_to_html_node
+from highlight import HIGHLIGHT_VERSION, LANGUAGES, MAX_IDLE_BUILDS, HighlightCache, highlight
+from sitetest import SiteTestCase
+
+SNIPPET = "```python\nfor x in range(3):\n    print('hi')  # 3 times\n```"
+
+class TestHighlight(SiteTestCase):
+    template_text = "{{ Content }}"
+
+    def setUp(self):
+        super().setUp()
+        self.cache_path = os.path.join(self.root, ".build", "highlight.json")
+
+    def tearDown(self):
+        helper.set_highlight_cache(None)
+        super().tearDown()
+
+    def test_highlight(self):
+        self.assertEqual(
+            highlight("if x < 10 { return \"if\" } // if", "JS"),
+            '<span class="k">if</span> x &lt; <span class="m">10</span> { <span class="k">return</span> '
+            '<span class="s">"if"</span> } <span class="c">// if</span>',
+        )
+        self.assertIsNone(highlight("anything", "cobol"))
+
+    def test_code_block_language(self):
+        self.assertEqual(
+            code_block_to_html_node(SNIPPET).to_html(),
+            '<pre><code class="language-python"><span class="k">for</span> x <span class="k">in</span> range(<span class="m">3</span>):\n'
+            '    print(<span class="s">\'hi\'</span>)  <span class="c"># 3 times</span></code></pre>',
+        )
+        # Unsupported languages are tagged but left as they were
+        self.assertEqual(
+            code_block_to_html_node("```text\nplain\n```").to_html(),
+            '<pre><code class="language-text">plain</code></pre>',
+        )
+        # Without a language on the fence line the first line is code
+        self.assertEqual(code_block_to_html_node("```\nls\n-la\n```").to_html(), "<pre><code>ls\n-la</code></pre>")
+
+    def test_cache_highlights_each_snippet_once(self):
+        cache = HighlightCache(self.cache_path)
+        helper.set_highlight_cache(cache)
+        with mock.patch.object(LANGUAGES["python"], "highlight", wraps=LANGUAGES["python"].highlight) as tokenize:
+            first = code_block_to_html_node(SNIPPET).to_html()
+            self.assertEqual(code_block_to_html_node(SNIPPET.replace("python", "py")).to_html().replace("py", "python"), first)
+            code_block_to_html_node(SNIPPET).to_html()
+            # Aliases share the entry of their language
+            self.assertEqual(tokenize.call_count, 1)
+        cache.save()
+
+        with mock.patch.object(LANGUAGES["python"], "highlight") as tokenize:
+            helper.set_highlight_cache(HighlightCache(self.cache_path))
+            self.assertEqual(code_block_to_html_node(SNIPPET).to_html(), first)
+            tokenize.assert_not_called()
+
+    def test_unused_entries_are_pruned(self):
+        cache = HighlightCache(self.cache_path)
+        cache.highlight("old()", "python")
+        cache.save()
+        for _ in range(MAX_IDLE_BUILDS - 1):
+            cache = HighlightCache(self.cache_path)
+            cache.highlight("new()", "py")
+            cache.save()
+        self.assertIn("old()", "".join(HighlightCache(self.cache_path).entries.values()))
+
+        # Builds that highlight nothing don't age the entries
+        HighlightCache(self.cache_path).save()
+        cache = HighlightCache(self.cache_path)
+        cache.highlight("new()", "python")
+        cache.save()
+        self.assertEqual(list(HighlightCache(self.cache_path).entries.values()), ["new()"])
+
+    def test_parallel_build_persists_worker_highlights(self):
+        for name, language in [("a", "python"), ("b", "bash"), ("c", "go")]:
+            self.write(self.source(f"{name}.md"), f"# Page {name}\n\n```{language}\nreturn 1\n```")
+
+        self.build(jobs=2, highlights=HighlightCache(self.cache_path))
+
+        with open(self.cache_path, encoding="utf-8") as file:
+            entries = json.load(file)["entries"]
+        self.assertEqual(sorted(key.split(":")[0] for key in entries), ["bash", "go", "python"])
+
+    def test_highlighter_upgrade_bypasses_render_cache(self):
+        self.write(self.source("index.md"), f"# Code\n\n{SNIPPET}")
+        cache = RenderCache(os.path.join(self.root, ".build", "render-cache"))
+        self.build(cache=cache)
+
+        with mock.patch.object(helper, "HIGHLIGHT_VERSION", HIGHLIGHT_VERSION + 1), mock.patch.object(helper, "highlight", return_value="<span>new</span>"):
+            self.build(cache=cache)
+
+        self.assertIn("<span>new</span>", self.read("index.html"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,6 @@
 import unittest
 
-from leafnode import LeafNode
+from leafnode import LeafNode, SharedLeafNode
 
 class TestLeafNode(unittest.TestCase):
     def test_leaf_to_html_p(self):
@@ -18,5 +18,23 @@ class TestLeafNode(unittest.TestCase):
         except ValueError as e:
             self.assertEqual(str(e), "All leaf nodes must have a value.")
 
+    def test_leaf_has_no_instance_dict(self):
+        node = LeafNode("a", "link", {"href": "/"})
+        self.assertFalse(hasattr(node, "__dict__"))
+        self.assertEqual(node.children, None)
+
+    def test_shared_leaf_renders_once(self):
+        props = {"href": "/"}
+        node = SharedLeafNode("a", "link", props)
+        props["href"] = "/changed"
+        with self.assertRaises(AttributeError):
+            node.value = "changed"
+        with self.assertRaises(TypeError):
+            node.props["href"] = "/changed"
+        self.assertEqual(node.props, {"href": "/"})
+        self.assertEqual(node.to_html(), '<a href="/">link</a>')
+        self.assertEqual(list(node.iter_html()), ['<a href="/">link</a>'])
+        self.assertFalse(hasattr(node, "__dict__"))
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,175 @@
+import contextlib
+import io
+import os
+import time
+import tracemalloc
+import unittest
+
+from cache import RenderCache
+from main import collect_pages, copy_file, generate_page, generate_pages
+from sitetest import TEMPLATE, SiteTestCase
+from stats import BuildStats
+
+class TestMain(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = self.paths["content_path"]
+        self.docs = self.paths["output_dir"]
+        self.template = self.paths["template_path"]
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nHello")
+        self.write(os.path.join(self.content, "blog", "a.md"), "# First post\n\nFirst")
+        self.write(os.path.join(self.content, "blog", "b.md"), "No title here")
+        self.write(os.path.join(self.content, "blog", "notes.txt"), "ignored")
+
+    def test_collect_pages(self):
+        pages = collect_pages(self.content, self.docs)
+        self.assertEqual(
+            [(os.path.relpath(s, self.content), os.path.relpath(d, self.docs)) for s, d in pages],
+            [
+                (os.path.join("blog", "a.md"), os.path.join("blog", "a.html")),
+                (os.path.join("blog", "b.md"), os.path.join("blog", "b.html")),
+                ("index.md", "index.html"),
+            ],
+        )
+
+    def test_generate_pages_collects_failures(self):
+        pages = collect_pages(self.content, self.docs)
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            failures = generate_pages(pages, self.template, "/")
+
+        self.assertEqual(
+            failures,
+            [(pages[1][0], pages[1][1], "ValueError: No h1 header found in the markdown.")],
+        )
+        self.assertIn("Pages: 2 generated, 0 up to date, 1 failed", out.getvalue())
+        self.assertEqual(
+            self.read(os.path.join(self.docs, "index.html")),
+            "<title>Home</title><body><div><h1>Home</h1><p>Hello</p></div></body>",
+        )
+
+    def test_generate_pages_in_parallel_matches_sequential(self):
+        pages = collect_pages(self.content, self.docs)
+        with contextlib.redirect_stdout(io.StringIO()):
+            sequential_failures = generate_pages(pages, self.template, "/")
+            sequential = [self.read(d) for s, d in pages if os.path.exists(d)]
+            for _, d in pages:
+                if os.path.exists(d):
+                    os.remove(d)
+            parallel_failures = generate_pages(pages, self.template, "/", jobs=2)
+
+        self.assertEqual(parallel_failures, sequential_failures)
+        self.assertEqual([self.read(d) for s, d in pages if os.path.exists(d)], sequential)
+
+    def test_generate_page_reuses_cached_body(self):
+        cache = RenderCache(os.path.join(self.root, "cache"))
+        source = os.path.join(self.content, "index.md")
+        dest = os.path.join(self.root, "index.html")
+        stats = BuildStats()
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_page(source, self.template, dest, "/", stats, cache)
+            self.write(self.template, "<h1>{{ Title }}</h1>{{ Content }}")
+            generate_page(source, self.template, dest, "/", stats, cache)
+
+        self.assertEqual(stats.counters, {"render_cache_miss": 1, "render_cache_hit": 1})
+        self.assertEqual(self.read(dest), "<h1>Home</h1><div><h1>Home</h1><p>Hello</p></div>")
+
+        # URLs are resolved into the body, so another basepath renders it again
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_page(source, self.template, dest, "/site/", stats, cache)
+        self.assertEqual(stats.counters, {"render_cache_miss": 2, "render_cache_hit": 1})
+
+    def test_page_time_spans_only_its_render(self):
+        source = os.path.join(self.content, "index.md")
+        self.write(source, "---\ntitle: Home\n---\n# Home\n\nHello")
+        stats = BuildStats()
+        before = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_page(source, self.template, os.path.join(self.root, "index.html"), "/", stats)
+
+        self.assertLessEqual(stats.pages[source], time.perf_counter() - before)
+
+    def test_layout_without_content_does_not_truncate_cache(self):
+        cache = RenderCache(os.path.join(self.root, "cache"))
+        source = os.path.join(self.content, "index.md")
+        dest = os.path.join(self.root, "index.html")
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.write(self.template, "<title>{{ Title }}</title>")
+            generate_page(source, self.template, dest, "/", cache=cache)
+            self.write(self.template, TEMPLATE)
+            generate_page(source, self.template, dest, "/", cache=cache)
+
+        self.assertEqual(self.read(dest), "<title>Home</title><body><div><h1>Home</h1><p>Hello</p></div></body>")
+
+    def test_basepath_leaves_code_samples_alone(self):
+        source = os.path.join(self.root, "code.md")
+        with open(source, "w", encoding="utf-8") as file:
+            file.write('# Code & <samples>\n\n[Up](/blog) `<a href="/x">`\n\n```html\n<img src="/y.png">\n```')
+        pages = [(source, os.path.join(self.root, "code.html"))]
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_pages(pages, self.template, "/site/", jobs=2)
+
+        self.assertEqual(
+            self.read(pages[0][1]),
+            '<title>Code &amp; &lt;samples&gt;</title><body><div><h1>Code &amp; &lt;samples&gt;</h1><p><a href="/site/blog">Up</a> <code>&lt;a href="/x"&gt;</code></p>'
+            '<pre><code class="language-html">&lt;img src="/y.png"&gt;</code></pre></div></body>',
+        )
+
+    def test_generate_page_memory_is_bounded_by_block_size(self):
+        source = os.path.join(self.root, "large.md")
+        dest = os.path.join(self.root, "large.html")
+        block = "Some **bold** text with a [link](/blog) in a paragraph of reasonable length.\n\n"
+        with open(source, "w", encoding="utf-8") as file:
+            file.write("# Large page\n\n")
+            file.write(block * 10_000)
+
+        tracemalloc.start()
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_page(source, self.template, dest, "/")
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        self.assertGreater(os.path.getsize(source), 750_000)
+        self.assertLess(peak, 200_000)
+
+    def test_copy_file_skips_synced_files(self):
+        src = os.path.join(self.root, "a.png")
+        dest = os.path.join(self.root, "b.png")
+        self.write(src, "png")
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertTrue(copy_file(src, dest))
+            self.assertFalse(copy_file(src, dest))
+
+            self.write(src, "jpeg")
+            self.assertTrue(copy_file(src, dest))
+        self.assertEqual(self.read(dest), "jpeg")
+
+    def test_copy_file_checksum_catches_same_size_and_mtime(self):
+        src = os.path.join(self.root, "a.png")
+        dest = os.path.join(self.root, "b.png")
+        self.write(src, "png")
+        with contextlib.redirect_stdout(io.StringIO()):
+            copy_file(src, dest)
+            stat = os.stat(src)
+            self.write(src, "PNG")
+            os.utime(src, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+            self.assertFalse(copy_file(src, dest))
+            self.assertTrue(copy_file(src, dest, checksum=True))
+        self.assertEqual(self.read(dest), "PNG")
+
+    def test_copy_file_link_never_writes_through(self):
+        src = os.path.join(self.root, "a.png")
+        other = os.path.join(self.root, "c.png")
+        dest = os.path.join(self.root, "b.png")
+        self.write(src, "png")
+        self.write(other, "other")
+        with contextlib.redirect_stdout(io.StringIO()):
+            copy_file(src, dest, link=True)
+            self.assertFalse(copy_file(src, dest, link=True))
+            copy_file(other, dest)
+
+        self.assertEqual(self.read(src), "png")
+        self.assertEqual(self.read(dest), "other")
+
+if __name__ == "__main__":
+    unittest.main()
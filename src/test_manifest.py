@@ -0,0 +1,136 @@
+import contextlib
+import hashlib
+import io
+import os
+import unittest
+from unittest import mock
+
+import helper
+from main import build, copy_dir, generate_pages_recursive
+from manifest import Manifest, hash_file
+from sitetest import TEMPLATE, SiteTestCase
+
+class TestManifest(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = self.paths["content_path"]
+        self.static = self.paths["static_path"]
+        self.docs = self.paths["output_dir"]
+        self.template = self.paths["template_path"]
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nHello")
+        self.write(os.path.join(self.content, "blog", "post.md"), "# Post\n\nWorld")
+        self.write(os.path.join(self.static, "index.css"), "body {}")
+
+    def build(self, basepath="/"):
+        manifest = Manifest(self.manifest_path)
+        with contextlib.redirect_stdout(io.StringIO()):
+            copy_dir(self.static, self.docs, manifest)
+            generate_pages_recursive(self.content, self.template, self.docs, basepath, manifest)
+        removed = manifest.remove_orphans(self.docs)
+        manifest.save()
+        return manifest, removed
+
+    def mtimes(self):
+        result = {}
+        for dirpath, _, filenames in os.walk(self.docs):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                result[os.path.relpath(path, self.docs)] = os.stat(path).st_mtime_ns
+        return result
+
+    def touch_outputs(self):
+        for dirpath, _, filenames in os.walk(self.docs):
+            for filename in filenames:
+                if filename.endswith(".html"):
+                    os.utime(os.path.join(dirpath, filename), ns=(0, 0))
+
+    def test_hash_file(self):
+        self.assertEqual(hash_file(self.template), hashlib.sha256(TEMPLATE.encode()).hexdigest())
+        # Spans several read chunks
+        data = bytes(range(256)) * 1000
+        path = os.path.join(self.root, "large.bin")
+        self.write_bytes(path, data)
+        self.assertEqual(hash_file(path), hashlib.sha256(data).hexdigest())
+
+    def test_manifest_is_persisted(self):
+        self.build()
+        manifest = Manifest(self.manifest_path)
+        self.assertTrue(manifest.loaded)
+        self.assertEqual(
+            manifest.entries[os.path.normpath(os.path.join(self.docs, "index.html"))]["basepath"],
+            "/",
+        )
+
+    def test_rebuild_skips_unchanged_outputs(self):
+        self.build()
+        self.touch_outputs()
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nChanged")
+        self.build()
+
+        mtimes = self.mtimes()
+        self.assertNotEqual(mtimes["index.html"], 0)
+        self.assertEqual(mtimes[os.path.join("blog", "post.html")], 0)
+
+    def test_template_and_basepath_changes_rebuild_pages(self):
+        self.build()
+        self.touch_outputs()
+        self.build(basepath="/site/")
+
+        mtimes = self.mtimes()
+        self.assertNotEqual(mtimes["index.html"], 0)
+        self.assertNotEqual(mtimes[os.path.join("blog", "post.html")], 0)
+
+    def test_parser_upgrade_rebuilds_pages(self):
+        self.build()
+        self.touch_outputs()
+        with mock.patch.object(helper, "PARSER_VERSION", helper.PARSER_VERSION + 1):
+            self.build()
+
+        self.assertNotEqual(self.mtimes()["index.html"], 0)
+
+    def test_failed_page_output_is_still_removed_with_its_source(self):
+        post = os.path.join(self.content, "blog", "post.md")
+        self.build()
+        self.write(post, "No title any more")
+        manifest, _ = self.build()
+        self.assertEqual(manifest.get(os.path.join(self.docs, "blog", "post.html")), {"source": post})
+
+        os.remove(post)
+        _, removed = self.build()
+        self.assertEqual(removed, [os.path.normpath(os.path.join(self.docs, "blog", "post.html"))])
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "blog")))
+
+    def test_orphaned_outputs_are_removed(self):
+        self.build()
+        os.remove(os.path.join(self.content, "blog", "post.md"))
+        _, removed = self.build()
+
+        self.assertEqual(removed, [os.path.normpath(os.path.join(self.docs, "blog", "post.html"))])
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "blog")))
+        self.assertTrue(os.path.exists(os.path.join(self.docs, "index.html")))
+
+    def test_outputs_outside_root_are_never_removed(self):
+        other = os.path.join(self.root, "other", "index.html")
+        self.write(other, "keep")
+        manifest = Manifest(self.manifest_path)
+        manifest.record(other, {"source": "gone.md"})
+
+        self.assertEqual(manifest.remove_orphans(self.docs), [])
+        self.assertFalse(manifest.remove(other, self.docs))
+        self.assertTrue(os.path.exists(other))
+
+    def test_builds_into_another_output_dir_leave_the_first_alone(self):
+        first, second = os.path.join(self.root, "outA"), os.path.join(self.root, "outB")
+        paths = {name: path for name, path in self.paths.items() if name != "output_dir"}
+        with contextlib.redirect_stdout(io.StringIO()):
+            build(output_dir=first, manifest=Manifest(self.manifest_path, first), **paths)
+            build(output_dir=second, manifest=Manifest(self.manifest_path, second), **paths)
+
+        self.assertTrue(os.path.exists(os.path.join(first, "index.html")))
+        self.assertTrue(os.path.exists(os.path.join(second, "index.html")))
+        # The manifest is now second's; first's is ignored rather than reused
+        self.assertFalse(Manifest(self.manifest_path, first).loaded)
+        self.assertTrue(Manifest(self.manifest_path, second).loaded)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import gzip
+import os
+import unittest
+
+from optimize import Precompressor, minify_css, minify_html
+from sitetest import SiteTestCase
+
+TEMPLATE = """<!doctype html>
+<html>
+    <head>
+        <!-- page title -->
+        <title>{{ Title }}</title>
+    </head>
+    <body>
+        <article>{{ Content }}</article>
+    </body>
+</html>
+"""
+
+CSS = """/* layout */
+body {
+    margin: 0 auto;
+    font-family: "Open  Sans", serif;
+}
+
+@media screen and (max-width: 600px) {
+    a > b, i { color: red; }
+}
+"""
+
+class TestOptimize(SiteTestCase):
+    template_text = TEMPLATE
+
+    def setUp(self):
+        super().setUp()
+        self.write(os.path.join(self.paths["static_path"], "index.css"), CSS)
+        self.write(self.source("index.md"), "# Home page\n\n```\nkeep   this\n```")
+        self.write(self.source("blog", "post.md"), "# Blog post\n\nWorld")
+
+    def build(self, minify=True, precompress=True, jobs=1):
+        precompressor = Precompressor(os.path.join(self.root, ".build", "precompressed.json")) if precompress else None
+        super().build(jobs=jobs, minify=minify, precompressor=precompressor)
+
+    def test_minify_html(self):
+        html = "<ul>\n  <li><b>a</b> <i>b</i></li>\n</ul>\n<!-- x --><pre>\n  keep\n</pre>"
+        self.assertEqual(minify_html(html), "<ul><li><b>a</b> <i>b</i></li></ul><pre>\n  keep\n</pre>")
+
+    def test_minify_css(self):
+        self.assertEqual(
+            minify_css(CSS),
+            'body{margin:0 auto;font-family:"Open  Sans",serif}'
+            "@media screen and (max-width:600px){a>b,i{color:red}}",
+        )
+
+    def test_build_minifies_template_and_css(self):
+        self.build(precompress=False)
+
+        self.assertEqual(
+            self.read("index.html"),
+            "<!doctype html><html><head><title>Home page</title></head><body><article>"
+            "<div><h1>Home page</h1><pre><code>keep   this</code></pre></div></article></body></html>",
+        )
+        self.assertEqual(self.read("index.css"), minify_css(CSS))
+
+        # Neither the minified copy nor the pages are redone by a no-op build
+        os.utime(self.output("index.css"), ns=(0, 0))
+        os.utime(self.output("index.html"), ns=(0, 0))
+        self.build(precompress=False)
+        self.assertEqual(os.stat(self.output("index.css")).st_mtime_ns, 0)
+        self.assertEqual(os.stat(self.output("index.html")).st_mtime_ns, 0)
+
+        self.build(minify=False, precompress=False)
+        self.assertEqual(self.read("index.css"), CSS)
+        self.assertTrue(self.read("index.html").startswith("<!doctype html>\n<html>"))
+
+    def test_precompressed_siblings(self):
+        self.build(jobs=2)
+
+        for parts in [("index.html",), ("index.css",), ("blog", "post.html"), ("sitemap.xml",)]:
+            with gzip.open(self.output(*parts) + ".gz", "rt", encoding="utf-8") as file:
+                self.assertEqual(file.read(), self.read(*parts))
+
+        os.utime(self.output("index.html.gz"), ns=(0, 0))
+        self.build()
+        self.assertEqual(os.stat(self.output("index.html.gz")).st_mtime_ns, 0)
+
+        os.remove(os.path.join(self.paths["content_path"], "blog", "post.md"))
+        self.build()
+        self.assertFalse(os.path.exists(self.output("blog", "post.html.gz")))
+
+        self.build(precompress=False)
+        self.assertFalse(os.path.exists(self.output("index.html.gz")))
+
+    def test_same_content_is_not_recompressed(self):
+        self.build()
+        os.utime(self.output("index.html.gz"), ns=(0, 0))
+        # Touching the output changes its stat but not its content hash
+        os.utime(self.output("index.html"), ns=(1, 1))
+        self.build()
+
+        self.assertEqual(os.stat(self.output("index.html.gz")).st_mtime_ns, 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,4 @@
+import io
 import unittest
 from leafnode import LeafNode
 from parentnode import ParentNode
@@ -28,7 +29,23 @@ class TestParentNode(unittest.TestCase):
             "<div><span><b>grandchild1</b></span><span><b>grandchild1</b><b>grandchild2</b></span></div>",
         )
 
+    def test_iter_html_yields_fragments_depth_first(self):
+        parent_node = ParentNode("div", [ParentNode("span", [LeafNode("b", "bold")]), LeafNode(None, "text")])
+        self.assertEqual(
+            list(parent_node.iter_html()),
+            ["<div>", "<span>", "<b>bold</b>", "</span>", "text", "</div>"],
+        )
+
+    def test_write_html(self):
+        parent_node = ParentNode("p", [LeafNode("i", "italic")], {"class": "note"})
+        fp = io.StringIO()
+        parent_node.write_html(fp)
+        self.assertEqual(fp.getvalue(), parent_node.to_html())
+        self.assertEqual(fp.getvalue(), '<p class="note"><i>italic</i></p>')
 
+    def test_to_html_without_children(self):
+        with self.assertRaises(ValueError):
+            ParentNode("div", []).to_html()
 
 if __name__ == "__main__":
     unittest.main()
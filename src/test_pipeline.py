@@ -0,0 +1,89 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from cache import RenderCache
+from main import collect_pages, generate_pages
+from pipeline import generate_pages_async
+from stats import BuildStats
+from template import Template
+
+TEMPLATE = '<title>{{ Title }}</title><link href="/index.css" /><body>{{ Content }}</body>'
+
+class TestPipeline(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, "content")
+        self.template = os.path.join(self.root, "template.html")
+
+        with open(self.template, "w", encoding="utf-8") as file:
+            file.write(TEMPLATE)
+        for i in range(12):
+            os.makedirs(os.path.join(self.content, f"page{i}"))
+            with open(os.path.join(self.content, f"page{i}", "index.md"), "w", encoding="utf-8", newline="") as file:
+                file.write(f"# Page number {i}\r\n\r\nSee [home](/) and ![logo](/logo.png)\n\n- **{i}**\n- `code`\n")
+        with open(os.path.join(self.content, "broken.md"), "w", encoding="utf-8") as file:
+            file.write("no title")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read_tree(self, root):
+        tree = {}
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                with open(path, "rb") as file:
+                    tree[os.path.relpath(path, root)] = file.read()
+        return tree
+
+    def test_output_is_byte_identical_to_sequential_build(self):
+        sequential = os.path.join(self.root, "sequential")
+        concurrent = os.path.join(self.root, "concurrent")
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_pages(collect_pages(self.content, sequential), self.template, "/site/")
+            failures = generate_pages(collect_pages(self.content, concurrent), self.template, "/site/", io_workers=4, io_queue=1)
+
+        self.assertEqual(self.read_tree(concurrent), self.read_tree(sequential))
+        self.assertEqual(len(self.read_tree(concurrent)), 12)
+        self.assertEqual([s for s, _, _ in failures], [os.path.join(self.content, "broken.md")])
+
+    def test_profile_records_render_thread_phases(self):
+        stats = BuildStats()
+        pages = collect_pages(self.content, os.path.join(self.root, "docs"))
+        generate_pages_async(pages, Template(TEMPLATE), "/", stats=stats, concurrency=2, queue_size=1)
+
+        for phase in ("parse", "inline", "serialize"):
+            self.assertGreater(stats.phases.get(phase, 0.0), 0.0, phase)
+        self.assertEqual(len(stats.pages), 12)
+
+    def test_errors_are_reported_per_page(self):
+        pages = collect_pages(self.content, os.path.join(self.root, "docs"))
+        pages.append((os.path.join(self.content, "missing.md"), os.path.join(self.root, "docs", "missing.html")))
+        errors, metadata = generate_pages_async(pages, Template(TEMPLATE), "/", concurrency=2, queue_size=2)
+
+        self.assertEqual(errors[0], "ValueError: No h1 header found in the markdown.")
+        self.assertTrue(errors[-1].startswith("FileNotFoundError"))
+        self.assertEqual(errors[1:-1], [None] * 12)
+        self.assertEqual((metadata[0], metadata[-1]), (None, None))
+        self.assertEqual(
+            metadata[1],
+            {"title": "Page number 0", "summary": "See home and logo", "meta": {}, "links": ["/"], "images": ["/logo.png"]},
+        )
+
+    def test_render_cache(self):
+        cache = RenderCache(os.path.join(self.root, "cache"))
+        pages = collect_pages(self.content, os.path.join(self.root, "docs"))[1:]
+        stats = BuildStats()
+        generate_pages_async(pages, Template(TEMPLATE), "/", cache, stats)
+        generate_pages_async(pages, Template(TEMPLATE), "/", cache, stats)
+
+        self.assertEqual((stats.counters["render_cache_miss"], stats.counters["render_cache_hit"]), (12, 12))
+        # Only the parsed pages build leaves: one link and one image each
+        self.assertEqual(stats.counters["shared_leaf_hit"] + stats.counters["shared_leaf_miss"], 24)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import json
+import os
+import unittest
+
+import helper
+from cache import RenderCache
+from search import PageTerms, SearchIndex, encode_positions, shard_name
+from sitetest import SiteTestCase
+from stats import BuildStats
+
+class TestSearch(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.build_dir = os.path.join(self.root, ".build")
+        self.write(self.source("index.md"), "# Home page\n\nWelcome to the **home** page")
+        self.write(self.source("blog", "post.md"), "# Blog post\n\n- A post about [Tolkien](/)\n\n```\nnot indexed\n```")
+
+    def shard(self, name):
+        with open(os.path.join(self.paths["output_dir"], "search", f"{name}.json"), encoding="utf-8") as file:
+            return json.load(file)
+
+    def build(self, **kwargs):
+        search = SearchIndex(os.path.join(self.build_dir, "search.json"))
+        super().build(search=search, **kwargs)
+        return search
+
+    def test_page_terms_collects_and_restores(self):
+        with PageTerms().collect() as terms:
+            helper.markdown_to_html_node("# Hello world\n\nHello _again_, World")
+
+        self.assertEqual(helper.OBSERVERS.active, [])
+        self.assertEqual(terms.terms, {"hello": [0, 2], "world": [1, 4], "again": [3]})
+
+    def test_shard_name_and_positions(self):
+        self.assertEqual(shard_name("tolkien"), "to")
+        self.assertEqual(shard_name("a"), "a")
+        self.assertEqual(shard_name("éa"), "_c3a961")
+        self.assertEqual(encode_positions(3, [2, 5, 9]), [3, 2, 3, 4])
+
+    def test_build_emits_sharded_index(self):
+        self.build()
+
+        pages = self.shard("pages")
+        self.assertEqual([page["url"] for page in pages["pages"]], ["/blog/post.html", "/"])
+        self.assertEqual(self.shard("to")["tolkien"], [[0, 5]])
+        self.assertEqual(self.shard("ho")["home"], [[1, 0, 5]])
+        self.assertIn("we", pages["shards"])
+        self.assertNotIn("no", pages["shards"])
+
+    def test_unchanged_pages_keep_postings(self):
+        cache = RenderCache(os.path.join(self.build_dir, "render-cache"))
+        self.build(cache=cache)
+
+        # A template change rerenders every page from the cache without reindexing it
+        stats = BuildStats()
+        self.write(self.paths["template_path"], "<h1>{{ Title }}</h1>{{ Content }}")
+        self.build(cache=cache, stats=stats)
+        self.assertEqual(stats.counters, {"render_cache_hit": 2})
+        self.assertEqual(self.shard("to")["tolkien"], [[0, 5]])
+
+        os.remove(self.source("blog", "post.md"))
+        search = self.build(cache=cache)
+        self.assertEqual(len(search.pages), 1)
+        self.assertEqual(self.shard("pages")["pages"], [{"url": "/", "title": "Home page"}])
+        self.assertNotIn("tolkien", self.shard("to"))
+        self.assertFalse(os.path.exists(os.path.join(self.paths["output_dir"], "search", "po.json")))
+
+    def test_missing_postings_are_collected_even_for_skipped_pages(self):
+        # Without a search index
+        super().build()
+        self.build(io_workers=2, cache=RenderCache(os.path.join(self.build_dir, "render-cache")))
+
+        self.assertEqual(self.shard("to")["tolkien"], [[0, 5]])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import contextlib
+import io
+import os
+import unittest
+
+from main import build
+from manifest import Manifest
+from serve import SiteWatcher
+from sitetest import SiteTestCase
+
+class TestSiteWatcher(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.paths["layouts_path"] = os.path.join(self.root, "layouts")
+        self.write(self.source("index.md"), "# Home page\n\nHello")
+        self.write(self.source("blog", "post.md"), "# Blog post\n\nWorld")
+        self.write(os.path.join(self.paths["static_path"], "index.css"), "body {}")
+
+        manifest = Manifest(self.manifest_path)
+        self.watcher = SiteWatcher(manifest=manifest, site_url=self.site_url, **self.paths)
+        with contextlib.redirect_stdout(io.StringIO()):
+            build(manifest=manifest, site_url=self.site_url, **self.paths)
+        self.touch_outputs()
+
+    def write(self, path, text):
+        # Edits land a second later, past any mtime granularity
+        super().write(path, text)
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    def touch_outputs(self):
+        for dirpath, _, filenames in os.walk(self.paths["output_dir"]):
+            for filename in filenames:
+                os.utime(os.path.join(dirpath, filename), ns=(0, 0))
+
+    def rebuilt(self, *parts):
+        return os.stat(self.output(*parts)).st_mtime_ns != 0
+
+    def poll(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return self.watcher.poll()
+
+    def test_no_changes(self):
+        self.assertEqual(self.poll(), ([], []))
+
+    def test_markdown_change_rebuilds_one_page(self):
+        self.write(self.source("blog", "post.md"), "# Blog post\n\nChanged")
+        self.poll()
+
+        self.assertTrue(self.rebuilt("blog", "post.html"))
+        self.assertFalse(self.rebuilt("index.html"))
+        self.assertFalse(self.rebuilt("index.css"))
+        with open(self.output("blog", "post.html"), encoding="utf-8") as file:
+            self.assertIn("Changed", file.read())
+
+    def test_static_change_copies_one_file(self):
+        self.write(os.path.join(self.paths["static_path"], "index.css"), "body { margin: 0; }")
+        self.poll()
+
+        self.assertTrue(self.rebuilt("index.css"))
+        self.assertFalse(self.rebuilt("index.html"))
+
+    def test_template_change_rebuilds_every_page(self):
+        self.write(self.paths["template_path"], "<h1>{{ Title }}</h1>{{ Content }}")
+        self.poll()
+
+        self.assertTrue(self.rebuilt("index.html"))
+        self.assertTrue(self.rebuilt("blog", "post.html"))
+        self.assertFalse(self.rebuilt("index.css"))
+
+    def test_partial_change_rebuilds_pages_using_it(self):
+        os.makedirs(os.path.join(self.paths["layouts_path"], "partials"))
+        self.write(os.path.join(self.paths["layouts_path"], "partials", "footer.html"), "<footer>v1</footer>")
+        self.write(os.path.join(self.paths["layouts_path"], "blog.html"), "<main>{{ Content }}</main>{{> footer }}")
+        self.poll()
+        with open(self.output("blog", "post.html"), encoding="utf-8") as file:
+            self.assertEqual(file.read(), "<main><div><h1>Blog post</h1><p>World</p></div></main><footer>v1</footer>")
+        self.assertFalse(self.rebuilt("index.html"))
+
+        self.touch_outputs()
+        self.write(os.path.join(self.paths["layouts_path"], "partials", "footer.html"), "<footer>v2</footer>")
+        self.poll()
+
+        self.assertTrue(self.rebuilt("blog", "post.html"))
+        self.assertFalse(self.rebuilt("index.html"))
+
+    def test_page_change_updates_feed(self):
+        self.write(self.source("blog", "post.md"), "# Renamed post\n\nWorld")
+        self.poll()
+
+        with open(self.output("blog", "feed.xml"), encoding="utf-8") as file:
+            self.assertIn("<title>Renamed post</title>", file.read())
+        self.assertFalse(self.rebuilt("index.html"))
+
+    def test_new_and_removed_pages(self):
+        os.makedirs(self.source("notes"))
+        self.write(self.source("notes", "index.md"), "# Notes page\n\nNew")
+        os.remove(self.source("blog", "post.md"))
+        self.poll()
+
+        self.assertTrue(os.path.exists(self.output("notes", "index.html")))
+        self.assertFalse(os.path.exists(self.output("blog", "post.html")))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import json
+import time
+import types
+import unittest
+
+from stats import BuildStats, NullStats
+
+class TestBuildStats(unittest.TestCase):
+    def test_nested_phases_are_exclusive(self):
+        stats = BuildStats()
+        with stats.phase("parse"):
+            time.sleep(0.01)
+            with stats.phase("inline"):
+                time.sleep(0.02)
+
+        self.assertGreaterEqual(stats.phases["inline"], 0.02)
+        self.assertGreaterEqual(stats.phases["parse"], 0.01)
+        self.assertLess(stats.phases["parse"], 0.02)
+
+    def test_timed_iter(self):
+        stats = BuildStats()
+
+        def fragments():
+            time.sleep(0.01)
+            yield "a"
+            yield "b"
+
+        self.assertEqual(list(stats.timed_iter(fragments(), "serialize")), ["a", "b"])
+        self.assertGreaterEqual(stats.phases["serialize"], 0.01)
+
+    def test_instrument_restores_function(self):
+        module = types.SimpleNamespace(work=lambda x: x * 2)
+        original = module.work
+        stats = BuildStats()
+        with stats.instrument(module, "work", "inline"):
+            self.assertEqual(module.work(2), 4)
+            self.assertIsNot(module.work, original)
+        self.assertIs(module.work, original)
+
+    def test_merge_and_slowest_pages(self):
+        stats = BuildStats()
+        stats.record_page("a.md", 0.1)
+        other = BuildStats()
+        other.record_page("b.md", 0.3)
+        other.record_page("c.md", 0.2)
+        other.phases["parse"] = 1.0
+        stats.merge(other)
+
+        self.assertEqual(stats.slowest_pages(2), [("b.md", 0.3), ("c.md", 0.2)])
+        self.assertEqual(stats.phases["parse"], 1.0)
+
+    def test_reports(self):
+        stats = BuildStats()
+        stats.record_page("a.md", 0.5)
+        stats.finish()
+
+        report = json.loads(stats.to_json())
+        self.assertEqual(report["pages"], 1)
+        self.assertEqual(report["slowest_pages"], [{"path": "a.md", "seconds": 0.5}])
+        self.assertIn("a.md", stats.format_table())
+
+    def test_hit_rates(self):
+        stats = BuildStats()
+        stats.count("shared_leaf_hit", 3)
+        stats.count("shared_leaf_miss", 1)
+        stats.count("render_cache_miss", 2)
+
+        self.assertEqual(stats.hit_rates(), {"render_cache": 0.0, "shared_leaf": 0.75})
+        self.assertIn("shared_leaf hit rate: 75.0%", stats.format_table())
+        self.assertEqual(json.loads(stats.to_json())["hit_rates"]["shared_leaf"], 0.75)
+
+    def test_null_stats(self):
+        stats = NullStats()
+        with stats.phase("parse"):
+            pass
+        self.assertEqual(list(stats.timed_iter(["a"], "serialize")), ["a"])
+
+if __name__ == "__main__":
+    unittest.main()
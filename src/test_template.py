@@ -0,0 +1,94 @@
+import io
+import os
+import tempfile
+import unittest
+
+from template import DEFAULT_LAYOUT, Template, TemplateRegistry, rewrite_basepath
+
+class TestTemplate(unittest.TestCase):
+    def test_compile_segments_and_slots(self):
+        template = Template("<title>{{ Title }}</title><main>{{ Content }}</main>")
+        self.assertEqual(template.segments, ["<title>", "</title><main>", "</main>"])
+        self.assertEqual([name for name, _ in template.slots], ["Title", "Content"])
+
+    def test_render(self):
+        template = Template("<title>{{ Title }}</title><main>{{ Content }}</main>")
+        self.assertEqual(
+            template.render(Title="Hello", Content="<p>World</p>"),
+            "<title>Hello</title><main><p>World</p></main>",
+        )
+
+    def test_write_streams_fragments(self):
+        template = Template("<main>{{ Content }}</main>")
+        fp = io.StringIO()
+        template.write(fp, Content=iter(["<p>", "a", "</p>"]))
+        self.assertEqual(fp.getvalue(), "<main><p>a</p></main>")
+
+    def test_render_leaves_unknown_placeholders(self):
+        template = Template("{{ Title }} {{ Footer }}")
+        self.assertEqual(template.render(Title="Hello"), "Hello {{ Footer }}")
+
+    def test_basepath_rewritten_at_compile_time(self):
+        template = Template('<link href="/index.css" /><main>{{ Content }}</main>', "/site/")
+        self.assertEqual(
+            template.render(Content='<a href="/x">x</a>'),
+            '<link href="/site/index.css" /><main><a href="/x">x</a></main>',
+        )
+
+    def test_rewrite_basepath(self):
+        self.assertEqual(
+            rewrite_basepath('<a href="/a"></a><img src="/b.png"></img>', "/site/"),
+            '<a href="/site/a"></a><img src="/site/b.png"></img>',
+        )
+
+class TestTemplateRegistry(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.layouts = os.path.join(self.root, "layouts")
+        self.content = os.path.join(self.root, "content")
+        os.makedirs(os.path.join(self.layouts, "partials"))
+        self.write(os.path.join(self.root, "template.html"), "{{> header }}<main>{{ Content }}</main>")
+        self.write(os.path.join(self.layouts, "blog.html"), "{{> header }}<article>{{ Content }}</article>")
+        self.write(os.path.join(self.layouts, "partials", "header.html"), '<a href="/">{{> title }}</a>')
+        self.write(os.path.join(self.layouts, "partials", "title.html"), "{{ Title }}")
+        self.registry = TemplateRegistry(os.path.join(self.root, "template.html"), self.layouts, self.content, "/site/")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(text)
+
+    def test_partials_are_included_at_compile_time(self):
+        self.assertEqual(
+            self.registry.get().render(Title="Hi", Content="x"),
+            '<a href="/site/">Hi</a><main>x</main>',
+        )
+        self.assertEqual(len(self.registry.files()), 3)
+
+    def test_select_by_section_and_front_matter(self):
+        self.assertEqual(self.registry.select(os.path.join(self.content, "index.md")), DEFAULT_LAYOUT)
+        self.assertEqual(self.registry.select(os.path.join(self.content, "blog", "a", "index.md")), "blog")
+        self.assertEqual(self.registry.select(os.path.join(self.content, "docs", "a.md")), DEFAULT_LAYOUT)
+        self.assertEqual(self.registry.select(os.path.join(self.content, "index.md"), {"layout": "blog"}), "blog")
+        with self.assertRaises(FileNotFoundError):
+            self.registry.get("missing")
+
+    def test_refresh_drops_layouts_using_changed_files(self):
+        default, blog = self.registry.digest(), self.registry.digest("blog")
+        self.write(os.path.join(self.layouts, "blog.html"), "<article>{{ Content }}</article>")
+        os.utime(os.path.join(self.layouts, "blog.html"), ns=(0, 0))
+
+        self.assertEqual(self.registry.refresh(), ["blog"])
+        self.assertEqual(self.registry.digest(), default)
+        self.assertNotEqual(self.registry.digest("blog"), blog)
+
+    def test_recursive_partial(self):
+        self.write(os.path.join(self.layouts, "partials", "title.html"), "{{> header }}")
+        with self.assertRaises(ValueError):
+            self.registry.get()
+
+if __name__ == "__main__":
+    unittest.main()
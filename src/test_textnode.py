@@ -20,5 +20,15 @@ class TestTextNode(unittest.TestCase):
         node = TextNode("This is a text node", TextType.ITALIC)
         self.assertEqual(node.text_type, TextType.ITALIC)
 
+    def test_repr(self):
+        node = TextNode("alt", TextType.IMAGE, "/a.png")
+        self.assertEqual(repr(node), "TextNode(alt, image, /a.png)")
+
+    def test_slots(self):
+        node = TextNode("This is a text node", TextType.TEXT)
+        self.assertFalse(hasattr(node, "__dict__"))
+        with self.assertRaises(AttributeError):
+            node.extra = True
+
 if __name__ == "__main__":
     unittest.main()